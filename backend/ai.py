@@ -1,54 +1,241 @@
-from sentence_transformers import SentenceTransformer, util
-
-def recommend_tasks(tasks, mode="default"):
-    text_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    difficulty_model = SentenceTransformer("sentence-transformers/all-MiniLM-L12-v2")
-    impact_model = SentenceTransformer("sentence-transformers/paraphrase-MiniLM-L6-v2")
-    
-    priority_references = {
-        "urgent": "Tugas dengan deadline mendesak",
-        "daily": "Tugas harian",
-        "progress": "Tugas yang hampir selesai dan perlu diselesaikan",
-        "impact": "Tugas dengan dampak besar"
-    }
-    priority_reference = priority_references.get(mode, "Tugas dengan deadline mendesak")
-    
-    important_keywords = ["bug", "error", "urgent", "segera", "deadline", "hari ini", "besok"]
-    
-    status_weights = {"Pending": 1.0, "In Progress": 0.7, "Completed": 0.3}
-    
-    mode_weights = {
-        "urgent": {"text": 0.4, "priority": 0.3, "keyword": 0.3, "status": 0.2, "progress": 0.2},
-        "impact": {"text": 0.3, "impact": 0.4, "priority": 0.2, "status": 0.2, "progress": 0.1},
-        "progress": {"text": 0.2, "priority": 0.2, "status": 0.3, "progress": 0.5},
-        "daily": {"text": 0.3, "difficulty": 0.3, "priority": 0.2, "status": 0.2, "progress": 0.1},
-    }
-    
-    weights = mode_weights.get(mode, mode_weights["urgent"])
-    
-    task_scores = []
-    
-    for task in tasks:
-        text_score = util.pytorch_cos_sim(text_model.encode(task.title), text_model.encode(priority_reference)).item()
-        difficulty_score = util.pytorch_cos_sim(difficulty_model.encode(task.description), difficulty_model.encode("Tugas sulit")).item()
-        impact_score = util.pytorch_cos_sim(impact_model.encode(task.title), impact_model.encode("Dampak besar" if mode == "impact" else "Dampak kecil")).item()
-        priority_weight = 1 / (task.priority + 0.1)
-        keyword_bonus = sum(1.0 for word in important_keywords if word in task.title.lower() or word in task.description.lower())
-        status_score = status_weights.get(task.status, 0.5)
-        progress_score = (100 - task.progress) / 100
-        
-        final_score = (
-            text_score * weights.get("text", 0) +
-            difficulty_score * weights.get("difficulty", 0) +
-            impact_score * weights.get("impact", 0) +
-            priority_weight * weights.get("priority", 0) +
-            keyword_bonus * weights.get("keyword", 0) +
-            status_score * weights.get("status", 0) +
-            progress_score * weights.get("progress", 0)
+import os
+import json
+import time
+import heapq
+import threading
+import numpy as np
+from metrics import record_phase, timer
+
+# Model used for each scoring dimension. Pointing two dimensions at the same
+# model name makes them share a single loaded instance.
+MODEL_NAMES = {
+    "text": os.getenv("TASKAI_TEXT_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+    "difficulty": os.getenv("TASKAI_DIFFICULTY_MODEL", "sentence-transformers/all-MiniLM-L12-v2"),
+    "impact": os.getenv("TASKAI_IMPACT_MODEL", "sentence-transformers/paraphrase-MiniLM-L6-v2"),
+}
+MODEL_DEVICE = os.getenv("TASKAI_MODEL_DEVICE") or None  # None lets sentence-transformers pick
+TORCH_THREADS = int(os.getenv("TASKAI_TORCH_THREADS", "0"))  # 0 keeps the torch default
+ENCODE_BATCH_SIZE = int(os.getenv("TASKAI_ENCODE_BATCH_SIZE", "64"))
+
+# "torch" runs the sentence-transformers models; "onnx" runs models exported by export_models.py
+EMBEDDING_BACKEND = os.getenv("TASKAI_EMBEDDING_BACKEND", "torch")
+# Directory holding one sub-directory per model (named after the part of the model name after "/");
+# when set, models are read from there and nothing is downloaded
+MODEL_DIR = os.getenv("TASKAI_MODEL_DIR", "")
+# ONNX file loaded from each model directory; model.onnx is the unquantized export
+ONNX_MODEL_FILE = os.getenv("TASKAI_ONNX_MODEL_FILE", "model_int8.onnx")
+ONNX_THREADS = int(os.getenv("TASKAI_ONNX_THREADS", "0"))  # 0 lets onnxruntime pick
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+    raise ValueError(f"TASKAI_EMBEDDING_BACKEND must be one of {', '.join(EMBEDDING_BACKENDS)}, not {EMBEDDING_BACKEND!r}")
+
+# Task field embedded for each semantic dimension
+DIMENSION_FIELDS = {"text": "title", "difficulty": "description", "impact": "title"}
+
+PRIORITY_REFERENCES = {
+    "urgent": "Tugas dengan deadline mendesak",
+    "daily": "Tugas harian",
+    "progress": "Tugas yang hampir selesai dan perlu diselesaikan",
+    "impact": "Tugas dengan dampak besar"
+}
+
+IMPORTANT_KEYWORDS = ["bug", "error", "urgent", "segera", "deadline", "hari ini", "besok"]
+
+STATUS_WEIGHTS = {"Pending": 1.0, "In Progress": 0.7, "Completed": 0.3}
+
+MODE_WEIGHTS = {
+    "urgent": {"text": 0.4, "priority": 0.3, "keyword": 0.3, "status": 0.2, "progress": 0.2},
+    "impact": {"text": 0.3, "impact": 0.4, "priority": 0.2, "status": 0.2, "progress": 0.1},
+    "progress": {"text": 0.2, "priority": 0.2, "status": 0.3, "progress": 0.5},
+    "daily": {"text": 0.3, "difficulty": 0.3, "priority": 0.2, "status": 0.2, "progress": 0.1},
+}
+
+_models = {}
+_models_lock = threading.Lock()
+_reference_embeddings = {}
+
+def model_path(name):
+    """Local directory of a model under MODEL_DIR, or the hub name when MODEL_DIR is not set."""
+    if not MODEL_DIR:
+        return name
+    return os.path.join(MODEL_DIR, name.rsplit("/", 1)[-1])
+
+def model_key(dimension):
+    """Identifies the vectors a dimension produces; embeddings from different backends are not mixed."""
+    name = MODEL_NAMES[dimension]
+    if EMBEDDING_BACKEND == "onnx":
+        return f"{name}:onnx/{ONNX_MODEL_FILE}"
+    return name
+
+class OnnxEncoder:
+    """Sentence embeddings from an ONNX export of a sentence-transformers model.
+
+    Mean-pools the token embeddings over the attention mask, as the MiniLM
+    sentence-transformers models do, and exposes the subset of
+    SentenceTransformer.encode used here.
+    """
+
+    def __init__(self, path, model_file=ONNX_MODEL_FILE):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        max_length = 256
+        config_path = os.path.join(path, "sentence_bert_config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as config:
+                max_length = json.load(config).get("max_seq_length", max_length)
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if ONNX_THREADS > 0:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, model_file), options, providers=["CPUExecutionProvider"]
         )
-        
-        task_scores.append((task, final_score))
-    
-    task_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    return [task for task, _ in task_scores]
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        tokens = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        return (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.session.get_outputs()[0].shape[-1]), dtype=np.float32)
+        embeddings = np.concatenate([
+            self._encode_batch(texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)
+        ]).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+def load_model(name, backend=EMBEDDING_BACKEND):
+    if backend == "onnx":
+        return OnnxEncoder(model_path(name))
+    # Imported on first use: it pulls in torch, which costs seconds and hundreds of MB
+    # in workers that never score a task
+    from sentence_transformers import SentenceTransformer
+    if TORCH_THREADS > 0:
+        import torch
+        torch.set_num_threads(TORCH_THREADS)
+    return SentenceTransformer(model_path(name), device=MODEL_DEVICE)
+
+def get_model(dimension):
+    """Return the model for a scoring dimension, loading it once per process."""
+    name = MODEL_NAMES[dimension]
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            with timer("model_load"):
+                model = load_model(name)
+            _models[name] = model
+    return model
+
+def warmup_models():
+    """Eagerly load every configured model, e.g. from an app startup hook."""
+    for dimension in MODEL_NAMES:
+        get_model(dimension)
+
+def encode_texts(dimension, texts):
+    """Embed texts in batches, returning L2-normalized rows as a float32 matrix."""
+    model = get_model(dimension)
+    with timer("encode"):
+        return model.encode(
+            list(texts),
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32, copy=False)
+
+def reference_embedding(dimension, text):
+    """Embed a constant reference phrase once per model."""
+    key = (model_key(dimension), text)
+    embedding = _reference_embeddings.get(key)
+    if embedding is None:
+        embedding = encode_texts(dimension, [text])[0]
+        _reference_embeddings[key] = embedding
+    return embedding
+
+def reference_texts(mode):
+    priority_reference = PRIORITY_REFERENCES.get(mode, "Tugas dengan deadline mendesak")
+    return {
+        "text": priority_reference,
+        "difficulty": "Tugas sulit",
+        "impact": "Dampak besar" if mode == "impact" else "Dampak kecil",
+    }
+
+def embed_tasks(tasks, dimension):
+    """Embed the field a dimension scores on for every task, without caching."""
+    return encode_texts(dimension, (getattr(task, DIMENSION_FIELDS[dimension]) for task in tasks))
+
+def score_tasks(tasks, mode="default", embed=embed_tasks):
+    """Score every task for a mode in one pass and return a float array aligned with tasks.
+
+    `embed(tasks, dimension)` supplies the normalized embedding matrix for a
+    dimension, which lets callers serve it from a cache. Terms are accumulated
+    in the same order as the per-task formula, so the ranking matches it up to
+    floating point noise between near-equal scores.
+    """
+    weights = MODE_WEIGHTS.get(mode, MODE_WEIGHTS["urgent"])
+    scores = np.zeros(len(tasks), dtype=np.float64)
+    if not tasks:
+        return scores
+
+    start = time.perf_counter()
+    embed_seconds = 0.0
+    references = reference_texts(mode)
+    for dimension in DIMENSION_FIELDS:
+        weight = weights.get(dimension, 0)
+        if not weight:
+            continue
+        embed_start = time.perf_counter()
+        embeddings = embed(tasks, dimension)
+        reference = reference_embedding(dimension, references[dimension])
+        embed_seconds += time.perf_counter() - embed_start
+        scores += (embeddings @ reference).astype(np.float64) * weight
+
+    priorities = np.array([task.priority for task in tasks], dtype=np.float64)
+    scores += (1 / (priorities + 0.1)) * weights.get("priority", 0)
+
+    if weights.get("keyword"):
+        # Title and description are joined with a newline so no keyword can match across them
+        texts = np.array([f"{task.title}\n{task.description}".lower() for task in tasks])
+        keyword_bonus = sum((np.char.find(texts, word) >= 0).astype(np.float64) for word in IMPORTANT_KEYWORDS)
+        scores += keyword_bonus * weights["keyword"]
+
+    status = np.array([STATUS_WEIGHTS.get(task.status, 0.5) for task in tasks], dtype=np.float64)
+    scores += status * weights.get("status", 0)
+
+    progress = np.array([task.progress for task in tasks], dtype=np.float64)
+    scores += ((100 - progress) / 100) * weights.get("progress", 0)
+    # "embed" covers cache lookups as well as encoding; "scoring" is the arithmetic alone
+    record_phase("embed", embed_seconds)
+    record_phase("scoring", time.perf_counter() - start - embed_seconds)
+    return scores
+
+def recommend_tasks(tasks, mode="default", embed=embed_tasks, limit=None, offset=0):
+    """Return tasks ordered by score; with a limit only the requested page is selected."""
+    tasks = list(tasks)
+    scores = score_tasks(tasks, mode, embed)
+    with timer("select"):
+        if limit is None:
+            # Stable sort on the negated score keeps ties in their original order
+            order = np.argsort(-scores, kind="stable")[offset:]
+        else:
+            # Partial heap selection, equivalent to the head of the stable full sort
+            order = heapq.nlargest(offset + limit, range(len(tasks)), key=scores.__getitem__)[offset:]
+        return [tasks[i] for i in order]
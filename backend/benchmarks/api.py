@@ -0,0 +1,275 @@
+"""Latency and throughput of the main API endpoints on synthetic datasets.
+
+For each dataset size, a fresh interpreter seeds a throwaway SQLite database
+with tasks, comments and attachments. It then drives the app in-process
+through httpx's ASGI transport. A hashing stub stands in for the embedding
+models, so nothing is downloaded and the results measure the API, not the
+model. The results are written as JSON, labelled with the current commit, and
+--compare prints the change against an earlier run:
+
+    python benchmarks/api.py --output bench-new.json    # 1k, 10k and 100k tasks
+    python benchmarks/api.py --sizes 1000 10000 --output bench-new.json --compare bench-old.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import hashlib
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ENDPOINTS = [
+    "get_tasks", "get_task", "get_comments", "upload_attachment", "get_recommendations", "get_recommendations_filtered"
+]
+
+USERS = 50
+COMMENTS_PER_TASK = 3
+ATTACHMENT_EVERY = 10  # one attachment per this many tasks
+STUB_DIMENSIONS = 384
+
+WORDS = ["bug", "login", "laporan", "deploy", "server", "desain", "klien", "rapat", "API", "database",
+         "review", "invoice", "backup", "urgent", "deadline", "hari ini", "besok", "dokumentasi", "tes", "rilis"]
+
+class StubEncoder:
+    """Offline stand-in for SentenceTransformer: hashed bag of words, L2-normalized."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        texts = list(texts)
+        vectors = np.zeros((len(texts), STUB_DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % STUB_DIMENSIONS] += 1.0 if digest[4] & 1 else -1.0
+        if normalize_embeddings:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+def seed(engine, size, rng):
+    """Insert users, tasks, comments and attachments with executemany; returns the seconds taken."""
+    from sqlalchemy import insert
+    from models import Attachment, Comment, Task, User
+
+    start = time.perf_counter()
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com"} for i in range(USERS)
+        ])
+        for first in range(0, size, 5000):
+            rows = []
+            for i in range(first, min(first + 5000, size)):
+                created = now - timedelta(minutes=rng.randrange(60 * 24 * 365))
+                rows.append({
+                    "title": " ".join(rng.sample(WORDS, 3)) + f" {i}",
+                    "description": " ".join(rng.choices(WORDS, k=12)),
+                    "priority": rng.randint(1, 3),
+                    "status": rng.choice(["Pending", "In Progress", "Completed"]),
+                    "progress": rng.randrange(101),
+                    "created_at": created,
+                    "updated_at": created + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+                    "is_deleted": rng.random() < 0.02,
+                })
+            conn.execute(insert(Task), rows)
+            conn.execute(insert(Comment), [
+                {"task_id": task_id, "author_id": rng.randint(1, USERS), "content": " ".join(rng.choices(WORDS, k=8))}
+                for task_id in range(first + 1, first + len(rows) + 1)
+                for _ in range(COMMENTS_PER_TASK)
+            ])
+            conn.execute(insert(Attachment), [
+                {"task_id": task_id, "original_name": f"file{task_id}.txt", "file_name": f"seed/{task_id}.txt",
+                 "file_url": f"uploads/seed/{task_id}.txt", "is_deleted": False}
+                for task_id in range(first + 1, first + len(rows) + 1, ATTACHMENT_EVERY)
+            ])
+    return time.perf_counter() - start
+
+def build_request(endpoint, size, rng, sequence):
+    """(method, url, keyword arguments for httpx) of one request."""
+    task_id = rng.randint(1, size)
+    if endpoint == "get_tasks":
+        status = rng.choice(["Pending", "In Progress", "Completed"])
+        sort = rng.choice(["id", "-updated_at", "priority"])
+        return "GET", f"/tasks/?limit=50&status={status}&sort={sort}", {}
+    if endpoint == "get_task":
+        return "GET", f"/tasks/{task_id}", {}
+    if endpoint == "get_comments":
+        return "GET", f"/tasks/{task_id}/comments/?limit=50", {}
+    if endpoint == "upload_attachment":
+        # Unique content each time, so every upload stores a new blob
+        content = f"benchmark upload {sequence} {rng.random()}\n".encode() * 64
+        return "POST", f"/tasks/{task_id}/attachments/", {"files": {"file": (f"bench{sequence}.txt", content, "text/plain")}}
+    mode = rng.choice(["urgent", "daily", "progress", "impact"])
+    if endpoint == "get_recommendations_filtered":
+        status = rng.choice(["Pending", "In Progress", "Completed"])
+        return "GET", f"/tasks/recommendations/?mode={mode}&limit=10&offset=20&status={status}&priority={rng.randint(1, 3)}", {}
+    return "GET", f"/tasks/recommendations/?mode={mode}&limit=10", {}
+
+async def measure(client, endpoint, size, requests, concurrency, rng):
+    latencies = []
+    statuses = {}
+    pending = [build_request(endpoint, size, rng, i) for i in range(requests)]
+
+    async def worker():
+        while pending:
+            method, url, kwargs = pending.pop()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": requests,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        # Real status codes; 404s are expected for the few soft-deleted tasks
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+async def run_size(size, requests, concurrency, seed_value):
+    """Benchmark one dataset size; runs in a child interpreter configured by run_worker."""
+    import httpx
+    import ai
+    import main
+    from database import engine, init_db
+
+    # Every model the scoring asks for is the offline stub
+    ai.load_model = lambda name, backend=None: StubEncoder(name)
+    # Per-request log lines would dominate the output and the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(seed_value)
+    init_db()
+    seed_seconds = seed(engine, size, rng)
+    result = {"tasks": size, "seed_seconds": round(seed_seconds, 2), "endpoints": {}}
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # The first recommendation embeds every task and builds the ranking
+            start = time.perf_counter()
+            await client.get("/tasks/recommendations/?mode=urgent&limit=10")
+            result["recommendations_cold_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            for endpoint in ENDPOINTS:
+                # A few unmeasured requests warm connections and statement caches
+                await measure(client, endpoint, size, min(20, requests), 1, rng)
+                result["endpoints"][endpoint] = await measure(client, endpoint, size, requests, concurrency, rng)
+    return result
+
+def run_worker(args):
+    result = asyncio.run(run_size(args.worker_size, args.requests, args.concurrency, args.seed))
+    with open(args.worker_output, "w") as target:
+        json.dump(result, target)
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(results, baseline):
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} (p50 / p95, negative is faster):")
+    for size, result in results.items():
+        previous = baseline["sizes"].get(size)
+        if previous is None:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            before = previous["endpoints"].get(endpoint)
+            if before is None:
+                continue
+            changes = [
+                f"{(stats[key] - before[key]) / before[key] * 100:+6.1f}%" if before[key] else "   n/a"
+                for key in ("p50_ms", "p95_ms")
+            ]
+            print(f"  {size:>7} tasks  {endpoint:28s} {changes[0]} / {changes[1]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on (off by default)")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_size:
+        run_worker(args)
+        return
+
+    results = {}
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="taskai-bench-")
+        output = os.path.join(workdir, "result.json")
+        env = dict(
+            os.environ,
+            TASKAI_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            TASKAI_VECTOR_INDEX_PATH=os.path.join(workdir, "vector_index.npz"),
+            TASKAI_WARMUP_MODELS="0",
+            TASKAI_EMBEDDING_BACKEND="torch",
+        )
+        if not args.cache:
+            env["TASKAI_RESPONSE_CACHE_TTL"] = "0"
+        try:
+            print(f"Benchmarking {size} tasks...", flush=True)
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker-size", str(size), "--worker-output", output,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--seed", str(args.seed)],
+                env=env, cwd=workdir, check=True, stdout=subprocess.DEVNULL,
+            )
+            with open(output) as source:
+                results[str(size)] = json.load(source)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        result = results[str(size)]
+        print(f"  seeded in {result['seed_seconds']} s, first recommendation {result['recommendations_cold_ms']} ms")
+        for endpoint, stats in result["endpoints"].items():
+            print(f"  {endpoint:28s} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                  f"p99 {stats['p99_ms']:8.2f} ms  {stats['throughput_rps']:8.1f} req/s  {stats['statuses']}")
+
+    report = {
+        "commit": current_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed, "response_cache": args.cache,
+        },
+        "sizes": results,
+    }
+    with open(args.output, "w") as target:
+        json.dump(report, target, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as source:
+            print_comparison(results, json.load(source))
+
+if __name__ == "__main__":
+    main()
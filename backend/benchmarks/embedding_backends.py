@@ -0,0 +1,139 @@
+"""Compare embedding backends on a fixed task corpus: accuracy against torch, latency and memory.
+
+Each configuration runs in its own interpreter, so model memory is measured
+separately. The torch backend is the reference. For the others, the
+report gives the cosine similarity of their embeddings to the torch ones,
+the rank correlation of the recommendation scores in every mode, and the
+overlap of the top 10:
+
+    python export_models.py --output models
+    TASKAI_MODEL_DIR=models python benchmarks/embedding_backends.py --tasks 1000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from types import SimpleNamespace
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# name -> environment of the worker process
+CONFIGURATIONS = {
+    "torch fp32": {"TASKAI_EMBEDDING_BACKEND": "torch"},
+    "onnx fp32": {"TASKAI_EMBEDDING_BACKEND": "onnx", "TASKAI_ONNX_MODEL_FILE": "model.onnx"},
+    "onnx int8": {"TASKAI_EMBEDDING_BACKEND": "onnx", "TASKAI_ONNX_MODEL_FILE": "model_int8.onnx"},
+}
+
+SUBJECTS = ["bug login", "laporan bulanan", "deploy server", "desain landing page", "rapat klien",
+            "dokumentasi API", "migrasi database", "review kode", "invoice vendor", "backup harian"]
+ACTIONS = ["Perbaiki", "Selesaikan", "Siapkan", "Cek ulang", "Update", "Kirim"]
+DETAILS = ["sebelum deadline besok", "untuk tim marketing", "error di production", "hari ini",
+           "dengan prioritas rendah", "setelah rilis minggu depan", "yang tertunda sejak lama"]
+
+def task_corpus(size):
+    """Deterministic tasks mixing the phrases and keywords the scoring looks at."""
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            title=f"{ACTIONS[i % len(ACTIONS)]} {SUBJECTS[i % len(SUBJECTS)]}",
+            description=f"{SUBJECTS[(i * 7) % len(SUBJECTS)]} {DETAILS[i % len(DETAILS)]} #{i}",
+            priority=i % 3 + 1,
+            status=("Pending", "In Progress", "Completed")[i % 3],
+            progress=(i * 37) % 101,
+        )
+        for i in range(size)
+    ]
+
+def run_worker(size, output):
+    """Embed and score the corpus with the backend configured in the environment; save the results."""
+    from ai import DIMENSION_FIELDS, MODE_WEIGHTS, embed_tasks, get_model, score_tasks
+
+    tasks = task_corpus(size)
+    start = time.perf_counter()
+    for dimension in DIMENSION_FIELDS:
+        get_model(dimension)
+    load_seconds = time.perf_counter() - start
+
+    embeddings = {}
+    encode_seconds = 0.0
+    for dimension in DIMENSION_FIELDS:
+        embed_tasks(tasks[:16], dimension)  # warm-up
+        start = time.perf_counter()
+        embeddings[dimension] = embed_tasks(tasks, dimension)
+        encode_seconds += time.perf_counter() - start
+
+    scores = {mode: score_tasks(tasks, mode) for mode in MODE_WEIGHTS}
+    np.savez(
+        output,
+        load_seconds=load_seconds,
+        encode_seconds=encode_seconds,
+        max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **{f"embedding_{dimension}": matrix for dimension, matrix in embeddings.items()},
+        **{f"scores_{mode}": values for mode, values in scores.items()},
+    )
+
+def _ranks(values):
+    return np.argsort(np.argsort(-values, kind="stable"), kind="stable").astype(np.float64)
+
+def rank_correlation(a, b):
+    """Spearman correlation: Pearson correlation of the ranks."""
+    return float(np.corrcoef(_ranks(a), _ranks(b))[0, 1])
+
+def top_overlap(a, b, k=10):
+    return len(set(np.argsort(-a)[:k]) & set(np.argsort(-b)[:k])) / k
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.tasks, args.worker)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="taskai-bench-")
+    results = {}
+    try:
+        for name, env in CONFIGURATIONS.items():
+            output = os.path.join(workdir, f"{len(results)}.npz")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--tasks", str(args.tasks), "--worker", output],
+                env=dict(os.environ, **env), cwd=BACKEND_DIR, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                print(f"⚠️ Skipped {name}: {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}")
+                continue
+            with np.load(output) as data:
+                results[name] = dict(data)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if "torch fp32" not in results:
+        sys.exit("❌ The torch reference could not run")
+    reference = results["torch fp32"]
+    dimensions = [key[len("embedding_"):] for key in reference if key.startswith("embedding_")]
+    modes = [key[len("scores_"):] for key in reference if key.startswith("scores_")]
+
+    print(f"{args.tasks} tasks, {len(dimensions)} dimensions\n")
+    print(f"{'backend':12s} {'load s':>7s} {'ms/task':>8s} {'RSS MB':>7s} {'min cos':>8s} "
+          f"{'mean cos':>9s} {'min rho':>8s} {'top10':>6s}")
+    for name, result in results.items():
+        cosines = np.concatenate([
+            # Rows are L2-normalized, so the row-wise dot product is the cosine similarity
+            np.sum(result[f"embedding_{d}"] * reference[f"embedding_{d}"], axis=1) for d in dimensions
+        ])
+        rhos = [rank_correlation(result[f"scores_{m}"], reference[f"scores_{m}"]) for m in modes]
+        overlaps = [top_overlap(result[f"scores_{m}"], reference[f"scores_{m}"]) for m in modes]
+        per_task_ms = float(result["encode_seconds"]) / (args.tasks * len(dimensions)) * 1000
+        print(f"{name:12s} {float(result['load_seconds']):7.1f} {per_task_ms:8.3f} {float(result['max_rss_mb']):7.0f} "
+              f"{cosines.min():8.4f} {cosines.mean():9.4f} {min(rhos):8.4f} {min(overlaps):6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compare the default response path of GET /tasks/ with the column-row + orjson one.
+
+Seeds a throwaway SQLite database and times, per request, the query plus the
+encoding of the whole task list:
+
+    python benchmarks/serialization.py --tasks 10000
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="taskai-bench-")
+    os.environ["TASKAI_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported after the database URL is set
+    from sqlalchemy import insert, select
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from database import SessionLocal, init_db
+    from models import Task
+    from schemas import TaskResponse
+    from response_cache import serialize
+
+    init_db()
+    db = SessionLocal()
+    db.execute(insert(Task), [
+        dict(title=f"Task {i}", description=f"Description of task {i} " * 4,
+             priority=i % 3 + 1, status=("Pending", "In Progress", "Completed")[i % 3], progress=i % 101)
+        for i in range(args.tasks)
+    ])
+    db.commit()
+
+    field = create_response_field(name="tasks", type_=list[TaskResponse])
+    fields = list(TaskResponse.model_fields)
+    columns = [getattr(Task, f) for f in fields]
+
+    def orm_response_model():
+        # What FastAPI does with ORM entities and response_model=list[TaskResponse]
+        tasks = db.scalars(select(Task).where(Task.is_deleted == False)).all()
+        content = asyncio.run(serialize_response(field=field, response_content=tasks, is_coroutine=True))
+        body = JSONResponse(content).body
+        db.expunge_all()
+        return body
+
+    def column_rows_orjson():
+        rows = db.execute(select(*columns).where(Task.is_deleted == False)).all()
+        return serialize([dict(zip(fields, row)) for row in rows])
+
+    if json.loads(orm_response_model()) != json.loads(column_rows_orjson()):
+        sys.exit("The two paths produced different JSON")
+
+    results = {}
+    for name, fn in (("ORM + response_model", orm_response_model), ("column rows + orjson", column_rows_orjson)):
+        fn()
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = statistics.median(timings)
+        print(f"{name:24s} {results[name]:8.1f} ms median  {len(body) / 1024:8.0f} KiB")
+
+    baseline, fast = results.values()
+    print(f"Speedup at {args.tasks} tasks: {baseline / fast:.1f}x")
+    db.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure how fast a worker imports the app and answers its first CRUD request.
+
+Each run is a fresh interpreter against a throwaway SQLite database. The
+"AI stack preloaded" variant imports sentence-transformers first, which is
+what every worker paid before the import was deferred:
+
+    python benchmarks/startup.py --runs 5
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line with its measurements
+WORKER = """
+import sys, time, json, resource
+start = time.perf_counter()
+{preload}
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    status = client.get("/tasks/").status_code
+    served = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (ready - start) * 1000,
+    "first_request_ms": (served - start) * 1000,
+    "status": status,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "torch_loaded": "torch" in sys.modules,
+}}))
+"""
+
+VARIANTS = {
+    "CRUD worker": "",
+    "AI stack preloaded": "import sentence_transformers",
+}
+
+def run_worker(preload, workdir):
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        TASKAI_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        TASKAI_WARMUP_MODELS="0",
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER.format(preload=preload)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="taskai-bench-")
+    try:
+        # The first run creates and migrates the database, so it is not timed
+        run_worker("", workdir)
+        for name, preload in VARIANTS.items():
+            runs = [run_worker(preload, workdir) for _ in range(args.runs)]
+            median = lambda key: statistics.median(run[key] for run in runs)
+            print(
+                f"{name:20s} import {median('import_ms'):7.0f} ms  "
+                f"first request {median('first_request_ms'):7.0f} ms  "
+                f"max RSS {median('max_rss_mb'):6.0f} MB  torch loaded: {runs[0]['torch_loaded']}"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
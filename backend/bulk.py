@@ -0,0 +1,207 @@
+import io
+import csv
+import json
+import codecs
+from datetime import datetime
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Task, Comment, User
+from pagination import naive_utc
+from schemas import TaskBulkRequest, TaskImport, CommentImport, UserImport
+
+# Rows per executemany / per fetched batch; also keeps IN (...) lists under SQLite's parameter limit
+BATCH_SIZE = 500
+
+# kind -> (model, import schema, exported columns in order)
+TABLES = {
+    "users": (User, UserImport, ["id", "username", "email", "created_at"]),
+    "tasks": (Task, TaskImport, [
+        "id", "title", "description", "priority", "status", "progress", "created_at", "updated_at", "is_deleted"
+    ]),
+    "comments": (Comment, CommentImport, ["id", "task_id", "author_id", "content", "created_at"]),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def apply_task_bulk(db: AsyncSession, bulk: TaskBulkRequest):
+    """Create, update and soft-delete tasks in the caller's transaction.
+
+    Returns (created tasks, updated ids, deleted ids, {field: ids whose text changed}).
+    Every id to update or delete must be a live task, and may appear only once.
+    """
+    update_ids = [task.id for task in bulk.update]
+    touched = update_ids + bulk.delete
+    if len(set(touched)) != len(touched):
+        raise HTTPException(status_code=400, detail="Each task may be updated or deleted only once per request")
+
+    current = {}
+    for chunk in _chunks(touched):
+        current.update(
+            (task_id, (title, description)) for task_id, title, description in await db.execute(
+                select(Task.id, Task.title, Task.description).where(Task.id.in_(chunk), Task.is_deleted == False)
+            )
+        )
+    missing = [task_id for task_id in touched if task_id not in current]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tasks not found: {', '.join(map(str, missing))}")
+
+    created = []
+    for chunk in _chunks(bulk.create):
+        created += (await db.scalars(insert(Task).returning(Task), [task.model_dump() for task in chunk])).all()
+
+    changed_fields = {"title": [], "description": []}
+    for task in bulk.update:
+        title, description = current[task.id]
+        if task.title != title:
+            changed_fields["title"].append(task.id)
+        if task.description != description:
+            changed_fields["description"].append(task.id)
+    for chunk in _chunks(bulk.update):
+        # ORM bulk UPDATE by primary key: one executemany instead of a SELECT and UPDATE per task
+        await db.execute(update(Task), [task.model_dump() for task in chunk])
+
+    for chunk in _chunks(bulk.delete):
+        await db.execute(
+            update(Task).where(Task.id.in_(chunk)).values(is_deleted=True).execution_options(synchronize_session=False)
+        )
+
+    return created, update_ids, bulk.delete, changed_fields
+
+async def load_tasks(db: AsyncSession, task_ids):
+    tasks = {}
+    for chunk in _chunks(task_ids):
+        tasks.update((task.id, task) for task in await db.scalars(
+            select(Task).where(Task.id.in_(chunk)).execution_options(populate_existing=True)
+        ))
+    return [tasks[task_id] for task_id in task_ids]
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_rows(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerows([["" if value is None else _value(value) for value in row] for row in rows])
+    return out.getvalue()
+
+async def export_rows(kind, fmt, include_deleted=False):
+    """Yield the rows of a table as NDJSON or CSV, BATCH_SIZE rows at a time."""
+    model, _, fields = TABLES[kind]
+    query = select(*[getattr(model, field) for field in fields]).order_by(model.id)
+    if kind == "tasks" and not include_deleted:
+        query = query.where(Task.is_deleted == False)
+
+    if fmt == "csv":
+        yield _csv_rows([fields])
+    # Opens its own session: the request's session is closed before a streamed body is sent
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=BATCH_SIZE))
+        async for rows in result.partitions():
+            if fmt == "csv":
+                yield _csv_rows(rows)
+            else:
+                yield "".join(
+                    json.dumps({field: _value(value) for field, value in zip(fields, row)}) + "\n" for row in rows
+                )
+
+async def _lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def _text_fields(schema):
+    return {name for name, field in schema.model_fields.items() if field.annotation is str}
+
+async def read_records(request: Request, fmt, kind):
+    """Yield (line number, record dict) from an NDJSON or CSV body as it arrives."""
+    line_number = 0
+    if fmt == "ndjson":
+        async for line in _lines(request):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Line {line_number}: invalid JSON")
+        return
+
+    text_fields = _text_fields(TABLES[kind][1])
+    fields = None
+    record = ""
+    async for line in _lines(request):
+        line_number += 1
+        record += line + "\n"
+        if record.count('"') % 2:
+            # A quoted value continues on the next line
+            continue
+        values = next(csv.reader([record]), None)
+        record = ""
+        if not values:
+            continue
+        if fields is None:
+            fields = values
+            continue
+        # CSV has no null: an empty cell is an empty string in a text column, and a missing
+        # value elsewhere, so ids, timestamps and deleted authors fall back to their defaults
+        yield line_number, {
+            field: value for field, value in zip(fields, values) if value != "" or field in text_fields
+        }
+
+async def import_rows(db: AsyncSession, kind, records):
+    """Insert validated records in executemany batches within the caller's transaction; returns the count."""
+    model, schema, _ = TABLES[kind]
+    pending = []
+    count = 0
+    explicit_ids = False
+    try:
+        async for line_number, record in records:
+            try:
+                row = schema.model_validate(record).model_dump(exclude_none=True)
+                for field, value in row.items():
+                    if isinstance(value, datetime):
+                        row[field] = naive_utc(value)
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(map(str, error["loc"]))
+                raise HTTPException(status_code=400, detail=f"Line {line_number}: {location}: {error['msg']}")
+            explicit_ids = explicit_ids or "id" in row
+            pending.append(row)
+            count += 1
+            if len(pending) >= BATCH_SIZE:
+                await _insert(db, model, pending)
+                pending = []
+        await _insert(db, model, pending)
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Import conflicts with existing data: {e.orig}")
+
+    if explicit_ids and db.get_bind().dialect.name == "postgresql":
+        # Rows inserted with explicit ids do not advance the id sequence
+        table = model.__tablename__
+        await db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+    return count
+
+async def _insert(db: AsyncSession, model, rows):
+    # executemany needs the same columns in every row, so rows are grouped by the fields they set
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    for group in groups.values():
+        await db.execute(insert(model.__table__), group)
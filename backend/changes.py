@@ -0,0 +1,350 @@
+"""Change feed: what happened to tasks, comments and attachments after a cursor.
+
+Database triggers (migration 5, `create_change_log`) append every insert,
+update and delete on those tables to `changes`. Bulk writes, imports and
+writes made by other workers are captured without hooks in the handlers.
+Clients either poll GET /changes with the cursor from their last response,
+or keep GET /changes/stream open. Each worker reads the log once for all of
+its stream subscribers, and only while it has any. Its own write handlers
+call `change_feed.notify()` so local changes go out without waiting for the
+next poll.
+
+Cursors are positions in the log. Ids come from a sequence and are taken at
+insert time, but rows only become visible when they commit. On SQLite a
+single writer commits in id order, so the position is the id. On PostgreSQL,
+a reader could see id N+1 before N commits and step past N for good. There,
+entries carry the id of the transaction that wrote them, and are read in
+(transaction id, id) order. Reads stop at the oldest transaction still
+running, because only a running transaction can still add entries. A
+position is therefore a (txid, id) pair, and txid is always 0 on SQLite.
+"""
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import delete, func, literal, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from database import AsyncSessionLocal
+from models import Attachment, Change, Comment, Task
+from pagination import datetime_bound, datetime_key, decode_cursor, encode_cursor
+from response_cache import serialize
+from schemas import ChangesResponse
+
+logger = logging.getLogger("taskai")
+
+# Most log entries returned by one /changes call or stream event
+CHANGES_PAGE_SIZE = 500
+# Seconds between reads of the log while this worker has stream subscribers
+CHANGES_POLL_INTERVAL = float(os.getenv("TASKAI_CHANGES_POLL_INTERVAL", "1"))
+# Log entries older than this are pruned; clients with an older cursor get 410 and reload
+CHANGES_RETENTION_DAYS = float(os.getenv("TASKAI_CHANGES_RETENTION_DAYS", "7"))
+
+HEARTBEAT_INTERVAL = 15
+PRUNE_INTERVAL = 3600
+# Events a stream may fall behind by before it is sent back to read the log itself
+SUBSCRIBER_QUEUE_SIZE = 64
+
+CURSOR_SORT = "changes"
+
+# table -> (entity, column holding the task id, has a soft-delete flag)
+LOGGED_TABLES = {
+    "tasks": ("task", "id", True),
+    "comments": ("comment", "task_id", False),
+    "attachments": ("attachment", "task_id", True),
+}
+
+def _sqlite_ddl(table, entity, task_column, soft_delete):
+    def log(row, action):
+        return (
+            "INSERT INTO changes (entity, entity_id, task_id, action) "
+            f"VALUES ('{entity}', {row}.id, {row}.{task_column}, {action}); END"
+        )
+    updated = "CASE WHEN new.is_deleted AND NOT old.is_deleted THEN 'deleted' ELSE 'updated' END" if soft_delete else "'updated'"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_changes_insert AFTER INSERT ON {table} BEGIN " + log("new", "'created'"),
+        f"CREATE TRIGGER IF NOT EXISTS {table}_changes_update AFTER UPDATE ON {table} BEGIN " + log("new", updated),
+        f"CREATE TRIGGER IF NOT EXISTS {table}_changes_delete AFTER DELETE ON {table} BEGIN " + log("old", "'deleted'"),
+    ]
+
+def _postgresql_ddl(table, entity, task_column, soft_delete):
+    soft_deleted = "WHEN NEW.is_deleted AND NOT OLD.is_deleted THEN 'deleted' " if soft_delete else ""
+    return [
+        f"CREATE OR REPLACE FUNCTION {table}_log_change() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP = 'DELETE' THEN "
+        f"INSERT INTO changes (entity, entity_id, task_id, action, txid) VALUES ('{entity}', OLD.id, OLD.{task_column}, 'deleted', txid_current()); "
+        "RETURN OLD; END IF; "
+        f"INSERT INTO changes (entity, entity_id, task_id, action, txid) VALUES ('{entity}', NEW.id, NEW.{task_column}, "
+        f"CASE WHEN TG_OP = 'INSERT' THEN 'created' {soft_deleted}ELSE 'updated' END, txid_current()); "
+        "RETURN NEW; END $$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {table}_changes ON {table}",
+        f"CREATE TRIGGER {table}_changes AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_log_change()",
+    ]
+
+def create_change_log(conn):
+    """Migration step: install the triggers that fill the `changes` table."""
+    build = {"sqlite": _sqlite_ddl, "postgresql": _postgresql_ddl}.get(conn.dialect.name)
+    if build is None:
+        print(f"⚠️ The change feed is not available on {conn.dialect.name}")
+        return
+    for table, spec in LOGGED_TABLES.items():
+        for statement in build(table, *spec):
+            conn.execute(text(statement))
+
+def add_transaction_ids(conn):
+    """Migration step: log the writing transaction of each entry on PostgreSQL, once the txid column exists."""
+    if conn.dialect.name != "postgresql":
+        return
+    create_change_log(conn)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_changes_txid_id ON changes (txid, id)"))
+
+# Oldest transaction still running; every entry written before it is committed or rolled back
+_HORIZON = func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+def _is_postgresql(db):
+    return db.get_bind().dialect.name == "postgresql"
+
+def entries_after(db, position, *columns):
+    """Select columns of the committed log entries after a position, in feed order; works for sync and async sessions."""
+    txid, change_id = position
+    stmt = select(Change.txid, Change.id, *columns)
+    if _is_postgresql(db):
+        return stmt.where(
+            tuple_(Change.txid, Change.id) > tuple_(literal(txid), literal(change_id)), Change.txid < _HORIZON
+        ).order_by(Change.txid, Change.id)
+    return stmt.where(Change.id > change_id).order_by(Change.id)
+
+def head_statement(db):
+    """Select the position of the last committed entry in feed order."""
+    stmt = select(Change.txid, Change.id)
+    if _is_postgresql(db):
+        return stmt.where(Change.txid < _HORIZON).order_by(Change.txid.desc(), Change.id.desc()).limit(1)
+    return stmt.order_by(Change.id.desc()).limit(1)
+
+def decode_change_cursor(cursor):
+    txid, change_id = decode_cursor(cursor, CURSOR_SORT)
+    # Cursors issued before transaction ids were logged carry none
+    txid = txid or 0
+    if not isinstance(change_id, int) or not isinstance(txid, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return txid, change_id
+
+def change_cursor(position):
+    return encode_cursor(CURSOR_SORT, *position)
+
+async def head_position(db: AsyncSession):
+    """Position of the latest log entry, (0, 0) when the log is empty."""
+    row = (await db.execute(head_statement(db))).first()
+    return (row.txid, row.id) if row else (0, 0)
+
+async def check_cursor(db: AsyncSession, position):
+    """410 when log entries after a position have been pruned."""
+    since_id = position[1]
+    oldest = await db.scalar(select(func.min(Change.id)))
+    if oldest is not None and since_id < oldest - 1:
+        # Pruned, or ids skipped by a rolled-back write on PostgreSQL;
+        # either way a full reload is the safe answer
+        raise HTTPException(status_code=410, detail="Cursor expired, reload the full lists")
+
+async def read_changes(db: AsyncSession, position, limit=CHANGES_PAGE_SIZE):
+    """Return (ChangesResponse-shaped dict, position of the last entry read) for entries after a position.
+
+    Rows are read in their current state, so an entity changed several times
+    is sent once, and one deleted since is only listed as deleted.
+    """
+    await check_cursor(db, position)
+    entries = (await db.execute(
+        entries_after(db, position, Change.entity, Change.entity_id).limit(limit + 1)
+    )).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    last = (entries[-1].txid, entries[-1].id) if entries else position
+
+    changed = {"task": set(), "comment": set(), "attachment": set()}
+    for entry in entries:
+        changed[entry.entity].add(entry.entity_id)
+
+    tasks = (await db.scalars(select(Task).where(Task.id.in_(changed["task"])))).all() if changed["task"] else []
+    comments = (await db.scalars(
+        select(Comment).where(Comment.id.in_(changed["comment"])).options(joinedload(Comment.author))
+    )).all() if changed["comment"] else []
+    attachments = (await db.scalars(
+        select(Attachment).where(Attachment.id.in_(changed["attachment"]))
+    )).all() if changed["attachment"] else []
+
+    live_tasks = [task for task in tasks if not task.is_deleted]
+    live_attachments = [attachment for attachment in attachments if not attachment.is_deleted]
+    payload = {
+        "tasks": sorted(live_tasks, key=lambda task: task.id),
+        "comments": sorted(comments, key=lambda comment: comment.id),
+        "attachments": sorted(live_attachments, key=lambda attachment: attachment.id),
+        "deleted": {
+            # Soft-deleted rows, and rows no longer in their table at all
+            "tasks": sorted(changed["task"] - {task.id for task in live_tasks}),
+            "comments": sorted(changed["comment"] - {comment.id for comment in comments}),
+            "attachments": sorted(changed["attachment"] - {attachment.id for attachment in live_attachments}),
+        },
+        "cursor": change_cursor(last),
+        "has_more": has_more,
+    }
+    return payload, last
+
+def empty_changes(position):
+    return {
+        "tasks": [], "comments": [], "attachments": [], "deleted": {},
+        "cursor": change_cursor(position), "has_more": False,
+    }
+
+async def prune_changes():
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHANGES_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        newest = await db.scalar(select(func.max(Change.id))) or 0
+        # The newest entry always stays, so an expired cursor can still be told apart
+        dialect = db.get_bind().dialect.name
+        result = await db.execute(delete(Change).where(
+            datetime_key(dialect, Change.created_at) < datetime_bound(dialect, cutoff), Change.id < newest
+        ))
+        await db.commit()
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} change log entries older than {CHANGES_RETENTION_DAYS:g} days")
+
+def sse_event(position, body):
+    # serialize() output is a single line, so it fits in one data field
+    return b"id: " + change_cursor(position).encode() + b"\nevent: changes\ndata: " + body + b"\n\n"
+
+class ChangeFeed:
+    """Fans the change log out to this worker's SSE subscribers.
+
+    One task reads the log and serializes each batch once for all subscribers.
+    Queue items are (first position, last position, event bytes). None means the
+    subscriber fell too far behind and must read the log itself.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._wake = None  # created in start(), on the server's event loop
+        self._task = None
+        self._last = None
+        self._pruned_at = 0.0
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Publish pending log entries now instead of at the next poll; called after a write commits."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        self.notify()
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def _run(self):
+        while True:
+            # With no subscribers the loop only wakes up to prune
+            timeout = CHANGES_POLL_INTERVAL if self._subscribers else PRUNE_INTERVAL
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                    self._pruned_at = time.monotonic()
+                    await prune_changes()
+                if self._subscribers:
+                    await self._publish()
+                else:
+                    # Subscribers that arrive later catch up from their own cursor
+                    self._last = None
+            except Exception as e:
+                logger.error(f"Change feed poll failed: {e}")
+
+    async def _publish(self):
+        async with AsyncSessionLocal() as db:
+            if self._last is None:
+                self._last = await head_position(db)
+                return
+            has_more = True
+            while has_more:
+                first = self._last
+                payload, self._last = await read_changes(db, first)
+                has_more = payload["has_more"]
+                if self._last == first:
+                    return
+                event = (first, self._last, sse_event(self._last, serialize(payload, ChangesResponse)))
+                for queue in list(self._subscribers):
+                    try:
+                        queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        # Drop its backlog; it reads what it missed from the log instead
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+
+change_feed = ChangeFeed()
+
+async def _catch_up(since):
+    """Read the log from a position up to its head; yields (last position, event bytes)."""
+    async with AsyncSessionLocal() as db:
+        has_more = True
+        while has_more:
+            payload, last = await read_changes(db, since)
+            has_more = payload["has_more"]
+            if last == since:
+                return
+            yield last, sse_event(last, serialize(payload, ChangesResponse))
+            since = last
+
+async def stream_changes(since):
+    """SSE body: changes after a position, then live batches as they are published."""
+    # Subscribed before catching up, so nothing committed in between is missed
+    queue = change_feed.subscribe()
+    try:
+        yield b"retry: 3000\n\n"
+        last = since
+        if last is None:
+            async with AsyncSessionLocal() as db:
+                last = await head_position(db)
+            yield b"id: " + change_cursor(last).encode() + b"\nevent: ready\ndata: {}\n\n"
+        async for last, event in _catch_up(last):
+            yield event
+
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                # Comment line that keeps proxies from closing an idle connection
+                yield b": keep-alive\n\n"
+                continue
+            if item is not None:
+                first, batch_last, event = item
+                if batch_last <= last:
+                    continue
+                if first == last:
+                    last = batch_last
+                    yield event
+                    continue
+            # Fell behind, or the batch starts after entries this stream has not seen
+            async for last, event in _catch_up(last):
+                yield event
+    finally:
+        change_feed.unsubscribe(queue)
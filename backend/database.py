@@ -1,12 +1,91 @@
+import os
+import time
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from models import Base
+from metrics import record_query
 
-DATABASE_URL = "sqlite:///./taskai.db"
+DATABASE_URL = os.getenv("TASKAI_DATABASE_URL", "sqlite:///./taskai.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})  # SQLite specific
+DB_POOL_SIZE = int(os.getenv("TASKAI_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("TASKAI_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("TASKAI_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("TASKAI_DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("TASKAI_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("TASKAI_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("TASKAI_SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+_url = make_url(DATABASE_URL)
+
+# Async driver for the request path; the sync engine stays for migrations and inference workers
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+ASYNC_DATABASE_URL = os.getenv("TASKAI_ASYNC_DATABASE_URL") or _url.set(
+    drivername=f"{_url.get_backend_name()}+{ASYNC_DRIVERS.get(_url.get_backend_name(), _url.get_driver_name())}"
+).render_as_string(hide_password=False)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+IS_SQLITE_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+def _engine_options(is_async=False):
+    options = {}
+    if not IS_SQLITE_MEMORY:
+        # In-memory SQLite uses a single-connection pool that takes no sizing options
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        if is_async and IS_SQLITE:
+            # aiosqlite defaults to NullPool, which reopens the file on every request
+            options["poolclass"] = AsyncAdaptedQueuePool
+    if IS_SQLITE:
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+    else:
+        # Server databases drop idle connections, so validate and recycle them
+        options["pool_pre_ping"] = True
+        options["pool_recycle"] = DB_POOL_RECYCLE
+    return options
+
+engine = create_engine(DATABASE_URL, **_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(is_async=True))
+# Objects stay readable after commit without a refresh round-trip
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the single writer instead of blocking on it
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.close()
+
+@event.listens_for(engine, "before_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    record_query(time.perf_counter() - conn.info["query_start_time"].pop(), statement)
+
+@event.listens_for(engine, "handle_error")
+@event.listens_for(async_engine.sync_engine, "handle_error")
+def _discard_query_timer(exception_context):
+    # Failed statements never reach after_cursor_execute
+    starts = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -14,10 +93,16 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     from models import Task # Import here to avoid circular import
+    from migrations import run_migrations
     try:
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         print("✅ Database initialized successfully.")
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
@@ -0,0 +1,95 @@
+import os
+import re
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# Stored file names never change: blobs are named by their hash, older files by timestamp and uuid
+CACHE_CONTROL = os.getenv("TASKAI_UPLOAD_CACHE_CONTROL", "public, max-age=31536000, immutable")
+
+# Hand the file to a front proxy instead of streaming it from Python:
+# "X-Accel-Redirect" for nginx, "X-Sendfile" for Apache/lighttpd
+SENDFILE_HEADER = os.getenv("TASKAI_SENDFILE_HEADER", "")
+# nginx `internal` location that maps onto UPLOAD_DIR, used with X-Accel-Redirect
+SENDFILE_PREFIX = os.getenv("TASKAI_SENDFILE_PREFIX", "/protected-uploads/")
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+def file_etag(stat, sha256=None):
+    """Strong validator: the content hash when known, else size and modification time."""
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to send the whole file, or "unsatisfiable"."""
+    match = _RANGE.fullmatch(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Multiple ranges and other units are valid to ignore; the full file is sent instead
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+def _read_file(path, start, length):
+    with open(path, "rb") as source:
+        source.seek(start)
+        while length > 0:
+            chunk = source.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def file_response(request: Request, path, stat, media_type=None, sha256=None, sendfile_name=None):
+    """Serve a stored file with caching validators and single byte-range support.
+
+    `stat` is the file's os.stat result. `sendfile_name` is its path relative
+    to UPLOAD_DIR, used when a front proxy serves the bytes.
+    """
+    etag = file_etag(stat, sha256)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    media_type = media_type or "application/octet-stream"
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if SENDFILE_HEADER:
+        # The proxy handles ranges and conditional requests on the file itself
+        target = SENDFILE_PREFIX + sendfile_name if SENDFILE_HEADER.lower() == "x-accel-redirect" else os.path.abspath(path)
+        headers[SENDFILE_HEADER] = target
+        return Response(media_type=media_type, headers=headers)
+
+    size = stat.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    # If-Range: only honour the range while the client's copy is still current
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(range_header, size)
+
+    if byte_range == "unsatisfiable":
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_read_file(path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_read_file(path, start, end - start + 1), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,107 @@
+import os
+import hashlib
+import logging
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from ai import DIMENSION_FIELDS, encode_texts, model_key
+from database import SessionLocal, engine
+from models import Task, TaskEmbedding
+
+logger = logging.getLogger("taskai")
+
+# Embed new and edited tasks right after the write instead of on the next recommendation call
+EMBED_ON_WRITE = os.getenv("TASKAI_EMBED_ON_WRITE", "1") == "1"
+
+# Keep IN (...) lists under SQLite's bound parameter limit
+_QUERY_CHUNK = 500
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _load_cached(db: Session, task_ids, field, model):
+    cached = {}
+    for start in range(0, len(task_ids), _QUERY_CHUNK):
+        chunk = task_ids[start:start + _QUERY_CHUNK]
+        cached.update(
+            (task_id, (hash_, vector)) for task_id, hash_, vector in db.execute(
+                select(TaskEmbedding.task_id, TaskEmbedding.text_hash, TaskEmbedding.vector).where(
+                    TaskEmbedding.task_id.in_(chunk),
+                    TaskEmbedding.field == field,
+                    TaskEmbedding.model == model
+                )
+            )
+        )
+    return cached
+
+_INSERT = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+def _store(task_ids, hashes, vectors, field, model):
+    rows = [
+        {"task_id": task_id, "field": field, "model": model, "text_hash": hash_, "vector": vector.tobytes()}
+        for task_id, hash_, vector in zip(task_ids, hashes, vectors)
+    ]
+    # An upsert, because a background refresh and a recommendation request may store the same task at once
+    statement = _INSERT[engine.dialect.name](TaskEmbedding)
+    statement = statement.on_conflict_do_update(
+        index_elements=["task_id", "field", "model"],
+        set_={"text_hash": statement.excluded.text_hash, "vector": statement.excluded.vector, "updated_at": func.now()},
+    )
+    # Written on a separate connection so committing does not expire the caller's ORM objects
+    with engine.begin() as conn:
+        for start in range(0, len(rows), _QUERY_CHUNK):
+            conn.execute(statement, rows[start:start + _QUERY_CHUNK])
+
+def get_task_embeddings(db: Session, tasks, dimension):
+    """Return embeddings for a dimension aligned with tasks, encoding only new or changed text."""
+    field = DIMENSION_FIELDS[dimension]
+    model = model_key(dimension)
+    cached = _load_cached(db, [task.id for task in tasks], field, model)
+
+    hashes = [text_hash(getattr(task, field)) for task in tasks]
+    vectors = [None] * len(tasks)
+    missing = []
+    for i, task in enumerate(tasks):
+        entry = cached.get(task.id)
+        if entry is not None and entry[0] == hashes[i]:
+            vectors[i] = np.frombuffer(entry[1], dtype=np.float32)
+        else:
+            missing.append(i)
+
+    if missing:
+        encoded = encode_texts(dimension, (getattr(tasks[i], field) for i in missing))
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+        _store([tasks[i].id for i in missing], [hashes[i] for i in missing], encoded, field, model)
+        logger.info(f"Embedded {len(missing)} of {len(tasks)} tasks for '{dimension}'")
+
+    return np.stack(vectors)
+
+def invalidate_task_embeddings(db: Session, task_ids, fields):
+    """Drop cached embeddings of the given tasks for the given fields; the caller commits."""
+    task_ids = list(task_ids)
+    for start in range(0, len(task_ids), _QUERY_CHUNK):
+        db.query(TaskEmbedding).filter(
+            TaskEmbedding.task_id.in_(task_ids[start:start + _QUERY_CHUNK]),
+            TaskEmbedding.field.in_(list(fields))
+        ).delete(synchronize_session=False)
+
+def refresh_task_embeddings(*task_ids):
+    """Fill the cache for the given tasks; meant to run as a background task after a write."""
+    db = SessionLocal()
+    try:
+        for start in range(0, len(task_ids), _QUERY_CHUNK):
+            tasks = db.query(Task).filter(
+                Task.id.in_(task_ids[start:start + _QUERY_CHUNK]),
+                Task.is_deleted == False
+            ).all()
+            if not tasks:
+                continue
+            for dimension in DIMENSION_FIELDS:
+                get_task_embeddings(db, tasks, dimension)
+    except Exception as e:
+        logger.error(f"Failed to embed tasks {', '.join(map(str, task_ids))}: {e}")
+    finally:
+        db.close()
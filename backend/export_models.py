@@ -0,0 +1,60 @@
+"""Export the scoring models to ONNX, with an int8 copy, for TASKAI_EMBEDDING_BACKEND=onnx.
+
+Each distinct model in ai.MODEL_NAMES is written to its own directory under
+the output directory, as ai.model_path expects:
+
+    <output>/<model>/            sentence-transformers files, tokenizer.json included
+    <output>/<model>/model.onnx       fp32 transformer, dynamic batch and sequence axes
+    <output>/<model>/model_int8.onnx  same with dynamically quantized int8 weights
+
+Point TASKAI_MODEL_DIR at the output directory to serve from it without
+downloads, with either backend. Needs torch, onnx and onnxruntime.
+
+Usage:
+    python export_models.py --output models
+"""
+import os
+import argparse
+from ai import MODEL_NAMES
+
+ONNX_OPSET = 14
+
+def export_model(name, target):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name, device="cpu")
+    # Tokenizer, pooling config and weights, so the torch backend can load the directory too
+    model.save(target)
+
+    transformer = model[0].auto_model.eval()
+    transformer.config.return_dict = False
+    sample = model.tokenizer(["Tugas contoh untuk ekspor"], return_tensors="pt")
+    # Positional order of BertModel.forward
+    input_names = [input_name for input_name in ("input_ids", "attention_mask", "token_type_ids") if input_name in sample]
+    dynamic_axes = {axis_name: {0: "batch", 1: "sequence"} for axis_name in input_names + ["last_hidden_state"]}
+
+    onnx_path = os.path.join(target, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[input_name] for input_name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+        )
+    quantize_dynamic(onnx_path, os.path.join(target, "model_int8.onnx"), weight_type=QuantType.QInt8)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the scoring models to ONNX with int8 copies")
+    parser.add_argument("--output", default="models", help="directory to use as TASKAI_MODEL_DIR")
+    args = parser.parse_args()
+
+    for name in sorted(set(MODEL_NAMES.values())):
+        target = os.path.join(args.output, name.rsplit("/", 1)[-1])
+        os.makedirs(target, exist_ok=True)
+        export_model(name, target)
+        print(f"✅ Exported {name} to {target}")
@@ -0,0 +1,97 @@
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+INFERENCE_WORKERS = int(os.getenv("TASKAI_INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("TASKAI_INFERENCE_QUEUE_SIZE", "8"))
+# Jobs queued by writes (embedding refresh, ranking and index updates) before new ones are skipped
+INFERENCE_BACKGROUND_QUEUE_SIZE = int(os.getenv("TASKAI_INFERENCE_BACKGROUND_QUEUE_SIZE", "32"))
+
+logger = logging.getLogger("taskai")
+
+class PoolBusy(Exception):
+    """Raised when the inference pool cannot accept more work."""
+
+class InferencePool:
+    """Bounded thread pool for model inference, kept apart from the request threadpool.
+
+    Jobs submitted with a key that is already running or queued share the
+    existing result instead of being computed again. Background jobs queued
+    by writes run on the same threads, so model work never spills onto the
+    request threadpool.
+    """
+
+    def __init__(self, max_workers=INFERENCE_WORKERS, queue_size=INFERENCE_QUEUE_SIZE,
+                 background_queue_size=INFERENCE_BACKGROUND_QUEUE_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="taskai-inference")
+        self._capacity = max_workers + queue_size
+        self._inflight = {}
+        self._background_capacity = background_queue_size
+        self._background = 0
+        self._background_keys = set()  # keys of background jobs not started yet
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if len(self._inflight) >= self._capacity:
+                raise PoolBusy()
+
+            # Runs in the submitter's context, so its metrics count towards the request that started the job
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._release(key, future))
+        return future
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def submit_background(self, fn, *args, key=None, fallback=None):
+        """Queue work nobody waits for, such as updates after a write.
+
+        A job whose key is already queued and not started is skipped, since
+        the queued one will see the same data. When the background queue is
+        full the job is dropped and `fallback`, which must be cheap and not
+        block, runs in the caller instead.
+        """
+        with self._lock:
+            if key is not None and key in self._background_keys:
+                return
+            accepted = self._background < self._background_capacity
+            if accepted:
+                self._background += 1
+                if key is not None:
+                    self._background_keys.add(key)
+        if not accepted:
+            logger.warning(f"Inference pool busy, skipped {fn.__qualname__}")
+            if fallback is not None:
+                fallback()
+            return
+        self._executor.submit(self._run_background, key, fn, *args)
+
+    def _run_background(self, key, fn, *args):
+        with self._lock:
+            self._background_keys.discard(key)
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"Background job {fn.__qualname__} failed: {e}")
+        finally:
+            with self._lock:
+                self._background -= 1
+
+    async def run(self, key, fn, *args):
+        # Shielded so a disconnecting client does not cancel a result other requests are waiting on
+        return await asyncio.shield(asyncio.wrap_future(self.submit(key, fn, *args)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+inference_pool = InferencePool()
@@ -1,19 +1,60 @@
 import os
-import shutil
-import uuid
 import logging
-import magic
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+import mimetypes
+from typing import Literal
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from database import get_db, init_db
-from models import Task, Comment, Attachment, User
-from schemas import TaskCreate, TaskResponse, TaskUpdate, CommentCreate, CommentResponse, AttachmentResponse, UserCreate, UserResponse
-from ai import recommend_tasks
-from datetime import datetime
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from database import async_engine, get_async_db, init_db
+from models import Task, Comment, Attachment, Blob, User
+from schemas import TaskCreate, TaskResponse, TaskUpdate, TaskBulkRequest, TaskBulkResponse, SimilarTaskResponse, TaskStatsResponse, SearchResult, ChangesResponse, CommentCreate, CommentResponse, AttachmentResponse, UserCreate, UserResponse
+from ai import warmup_models
+from embedding_cache import EMBED_ON_WRITE, invalidate_task_embeddings, refresh_task_embeddings
+from inference import PoolBusy, inference_pool
+from recommendations import normalize_mode, ranking_store
+from vector_index import find_duplicates, semantic_search, similar_tasks, vector_index
+from response_cache import response_cache, serialize
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render as render_metrics
+from changes import (
+    CHANGES_PAGE_SIZE, change_feed, check_cursor, decode_change_cursor, empty_changes, head_position, read_changes,
+    stream_changes
+)
+from pagination import apply_keyset, datetime_bound, datetime_key, decode_cursor, encode_cursor, parse_sort
+from stats import get_task_stats
+from search import search
+from bulk import MEDIA_TYPES, apply_task_bulk, export_rows, import_rows, load_tasks, read_records
+from downloads import file_response
+from uploads import (
+    INCOMING_DIR, UPLOAD_DIR, UPLOAD_OPENAPI, acquire_blob, blob_name, blob_path, check_content_length,
+    discard_upload, finish_blob, receive_upload, release_blob, remove_blob_file, store_blob, upload_path
+)
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger("taskai")
+logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing heavy happens at import: the AI stack loads on the first recommendation unless warmed up here
+    init_db()
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    if os.getenv("TASKAI_WARMUP_MODELS", "0") == "1":
+        await run_in_threadpool(warmup_models)
+        logger.info("AI models loaded")
+    change_feed.start()
+    yield
+    await change_feed.stop()
+    inference_pool.shutdown()
+    vector_index.save()
+    # Pooled aiosqlite connections each keep a non-daemon thread that would block interpreter exit
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,49 +62,235 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Ranking-Version", "X-Ranking-Updated-At", "X-Possible-Duplicates", "ETag", "Content-Range", "Accept-Ranges"],
 )
-
-init_db()
-
-logger = logging.getLogger("taskai")
-logging.basicConfig(level=logging.INFO)
+# Added last so it wraps CORS and times the whole request
+app.add_middleware(MetricsMiddleware)
 
 # ==========================
 # ✅ USERS ENDPOINTS
 # ==========================
 @app.post("/users/", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter((User.username == user.username) | (User.email == user.email)).first()
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(
+        select(User).where((User.username == user.username) | (User.email == user.email)).limit(1)
+    )
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already exists")
 
     new_user = User(username=user.username, email=user.email)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    response_cache.invalidate("users")
     return new_user
 
 @app.get("/users/", response_model=list[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+async def get_all_users(request: Request, db: AsyncSession = Depends(get_async_db)):
+    cache_key, cached = response_cache.lookup(request, ["users"])
+    if cached:
+        return cached
+    users = (await db.scalars(select(User))).all()
+    return response_cache.store(request, cache_key, users, list[UserResponse])
 
 # ==========================
 # ✅ TASKS ENDPOINTS
 # ==========================
 
+TASK_SORT_COLUMNS = {
+    "id": Task.id,
+    "created_at": Task.created_at,
+    "updated_at": Task.updated_at,
+    "priority": Task.priority,
+    "progress": Task.progress,
+}
+
+async def get_live_task(db: AsyncSession, task_id: int):
+    return await db.scalar(select(Task).where(Task.id == task_id, Task.is_deleted == False))
+
+# Writes touching more tasks than this flush the whole response cache instead
+MAX_INVALIDATED_TAGS = 100
+
+def _update_derived_data(task_ids, embed_ids):
+    # One job, so rescoring finds the embeddings just stored instead of encoding the same text again
+    if embed_ids:
+        refresh_task_embeddings(*embed_ids)
+    ranking_store.apply_task_write(*task_ids)
+
+def after_task_write(task_ids, embed_ids=()):
+    """Invalidate cached task responses, wake the change feed and queue the updates of data derived from tasks.
+
+    The updates run on the bounded inference pool, not the request threadpool.
+    If it is saturated, rankings are rebuilt on their next read instead, and
+    embeddings are computed when first needed.
+    """
+    if not task_ids:
+        return
+    change_feed.notify()
+    if len(task_ids) > MAX_INVALIDATED_TAGS:
+        response_cache.clear()
+    else:
+        response_cache.invalidate("tasks", *(f"task:{task_id}" for task_id in task_ids))
+    embed_ids = embed_ids if EMBED_ON_WRITE else ()
+    inference_pool.submit_background(_update_derived_data, task_ids, embed_ids, fallback=ranking_store.invalidate)
+    # The index catches up from the change log, so one queued sync covers any number of writes
+    inference_pool.submit_background(vector_index.sync, key="vector-index-sync")
+
+async def run_inference(key, fn, *args):
+    """Run model work on the inference pool, answering 503 when it is saturated."""
+    try:
+        return await inference_pool.run(key, fn, *args)
+    except PoolBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Recommendation service is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+
+async def similar_task_responses(db: AsyncSession, matches):
+    """Pair (task_id, score) matches with their live tasks, keeping the match order."""
+    tasks = {
+        task.id: task for task in await db.scalars(
+            select(Task).where(Task.id.in_([task_id for task_id, _ in matches]), Task.is_deleted == False)
+        )
+    }
+    return [
+        SimilarTaskResponse(**TaskResponse.from_orm(tasks[task_id]).model_dump(), score=score)
+        for task_id, score in matches if task_id in tasks
+    ]
+
 @app.get("/tasks/", response_model=list[TaskResponse])
-def get_tasks(db: Session = Depends(get_db)):
-    return db.query(Task).filter(Task.is_deleted == False).all()
+async def get_tasks(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    sort: str = "id",
+    status: list[str] | None = Query(None),
+    priority_min: int | None = None,
+    priority_max: int | None = None,
+    progress_min: int | None = None,
+    progress_max: int | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
+    fields: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    cache_key, cached = response_cache.lookup(request, ["tasks"])
+    if cached:
+        return cached
+
+    selected_fields = list(TaskResponse.model_fields)
+    if fields:
+        selected_fields = ["id"] + [f for f in fields.split(",") if f and f != "id"]
+        unknown = [f for f in selected_fields if f not in TaskResponse.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    sort_field, descending = parse_sort(sort, TASK_SORT_COLUMNS)
+    sort_column = TASK_SORT_COLUMNS[sort_field]
+
+    # Plain column rows instead of ORM entities: no identity map or instance state per task
+    columns = [getattr(Task, f) for f in selected_fields]
+    if sort_field not in selected_fields:
+        columns.append(sort_column)
+    query = select(*columns).where(Task.is_deleted == False)
+
+    dialect = db.get_bind().dialect.name
+    if status:
+        query = query.where(Task.status.in_(status))
+    if priority_min is not None:
+        query = query.where(Task.priority >= priority_min)
+    if priority_max is not None:
+        query = query.where(Task.priority <= priority_max)
+    if progress_min is not None:
+        query = query.where(Task.progress >= progress_min)
+    if progress_max is not None:
+        query = query.where(Task.progress <= progress_max)
+    if created_after is not None:
+        query = query.where(datetime_key(dialect, Task.created_at) >= datetime_bound(dialect, created_after))
+    if created_before is not None:
+        query = query.where(datetime_key(dialect, Task.created_at) < datetime_bound(dialect, created_before))
+    if updated_after is not None:
+        query = query.where(datetime_key(dialect, Task.updated_at) >= datetime_bound(dialect, updated_after))
+    if updated_before is not None:
+        query = query.where(datetime_key(dialect, Task.updated_at) < datetime_bound(dialect, updated_before))
+
+    cursor_value, cursor_id = decode_cursor(cursor, sort) if cursor else (None, None)
+    query = apply_keyset(query, dialect, sort_column, Task.id, descending, cursor_value, cursor_id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+
+    headers = {}
+    if limit is not None:
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            headers["X-Next-Cursor"] = encode_cursor(sort, getattr(last, sort_field), last.id)
+
+    # Values come straight from typed columns, so rows are encoded without a validation pass;
+    # zip drops the sort column when it was only selected for the cursor
+    content = [dict(zip(selected_fields, row)) for row in rows]
+    return response_cache.store(request, cache_key, content, headers=headers)
+
+MAX_STATS_DAYS = 366
+
+@app.get("/tasks/stats", response_model=TaskStatsResponse)
+async def get_task_statistics(
+    start: date | None = None,
+    end: date | None = None,
+    updated_after: datetime | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_STATS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_STATS_DAYS} days")
+
+    return await db.run_sync(get_task_stats, start, end, updated_after)
+
+@app.get("/tasks/semantic-search", response_model=list[SimilarTaskResponse])
+async def semantic_task_search(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    matches = await run_inference(("semantic-search", q, limit), semantic_search, q, limit)
+    return await similar_task_responses(db, matches)
+
+@app.get("/tasks/{task_id}/similar", response_model=list[SimilarTaskResponse])
+async def get_similar_tasks(
+    task_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    matches = await run_inference(("similar", task_id, limit), similar_tasks, task_id, limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return await similar_task_responses(db, matches)
 
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
-def get_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+async def get_task(task_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cache_key, cached = response_cache.lookup(request, [f"task:{task_id}"])
+    if cached:
+        return cached
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    return response_cache.store(request, cache_key, task, TaskResponse)
 
 @app.post("/tasks/", response_model=TaskResponse)
-def create_task(task: TaskCreate, db: Session = Depends(get_db)):
+async def create_task(
+    task: TaskCreate,
+    response: Response,
+    check_duplicates: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
     new_task = Task(
         title=task.title,
         description=task.description,
@@ -72,54 +299,183 @@ def create_task(task: TaskCreate, db: Session = Depends(get_db)):
         progress=task.progress
     )
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await db.commit()
+    await db.refresh(new_task)
+
+    if check_duplicates:
+        try:
+            duplicates = await inference_pool.run(
+                ("duplicates", new_task.id), find_duplicates, new_task.title, new_task.id
+            )
+            response.headers["X-Possible-Duplicates"] = ",".join(str(task_id) for task_id, _ in duplicates)
+        except PoolBusy:
+            # The task is already saved, so a busy pool only skips the check
+            logger.warning(f"Skipped duplicate check for task {new_task.id}: inference pool busy")
+
+    after_task_write([new_task.id], embed_ids=[new_task.id])
     return new_task
 
+MAX_BULK_ITEMS = int(os.getenv("TASKAI_BULK_MAX_ITEMS", "10000"))
+
+@app.post("/tasks/bulk", response_model=TaskBulkResponse)
+async def bulk_tasks(bulk: TaskBulkRequest, db: AsyncSession = Depends(get_async_db)):
+    if len(bulk.create) + len(bulk.update) + len(bulk.delete) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A bulk request is limited to {MAX_BULK_ITEMS} items")
+
+    created, updated_ids, deleted_ids, changed_fields = await apply_task_bulk(db, bulk)
+    for field, task_ids in changed_fields.items():
+        if task_ids:
+            await db.run_sync(invalidate_task_embeddings, task_ids, [field])
+    await db.commit()
+
+    updated = await load_tasks(db, updated_ids)
+    created_ids = [task.id for task in created]
+    embed_ids = created_ids + sorted(set(changed_fields["title"]) | set(changed_fields["description"]))
+    after_task_write(created_ids + updated_ids + deleted_ids, embed_ids=embed_ids)
+    return TaskBulkResponse(created=created, updated=updated, deleted=deleted_ids)
+
 @app.put("/tasks/{task_id}", response_model=TaskResponse)
-def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+async def update_task(task_id: int, task_update: TaskUpdate, db: AsyncSession = Depends(get_async_db)):
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    changed_fields = [
+        field for field in ("title", "description")
+        if getattr(task, field) != getattr(task_update, field)
+    ]
+    if changed_fields:
+        await db.run_sync(invalidate_task_embeddings, [task_id], changed_fields)
+
     task.title = task_update.title
     task.description = task_update.description
     task.priority = task_update.priority
     task.status = task_update.status
     task.progress = task_update.progress
 
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
+
+    after_task_write([task.id], embed_ids=[task.id] if changed_fields else [])
     return task
 
 @app.delete("/tasks/{task_id}")
-def delete_task(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
     task.is_deleted = True
-    db.commit()
+    await db.commit()
+    after_task_write([task_id])
     return {"message": "Task deleted successfully"}
 
 @app.get("/tasks/recommendations/", response_model=list[TaskResponse])
-def get_recommendations(mode: str = "urgent", db: Session = Depends(get_db)):
-    tasks = db.query(Task).filter(Task.is_deleted == False).all()
-    recommended_tasks = recommend_tasks(tasks, mode=mode)
+async def get_recommendations(
+    mode: str = "urgent",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    status: list[str] | None = Query(None),
+    priority: list[int] | None = Query(None),
+    exclude_completed: bool = False
+):
+    ranking = ranking_store.get(mode)
+    if ranking is None:
+        ranking = await run_inference(("ranking", normalize_mode(mode)), ranking_store.build, mode)
+
+    headers = {"X-Ranking-Version": str(ranking.version), "X-Ranking-Updated-At": ranking.updated_at.isoformat()}
+    tasks = ranking.page(limit, offset, set(status or []), set(priority or []), exclude_completed)
+    # Ranked entries are already TaskResponse models; dump them once instead of revalidating
+    return Response(serialize(tasks, list[TaskResponse]), media_type="application/json", headers=headers)
+
+# ==========================
+# ✅ SEARCH ENDPOINTS
+# ==========================
 
-    return [TaskResponse.from_orm(task) for task in recommended_tasks]
+@app.get("/search", response_model=list[SearchResult])
+async def search_text(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: list[Literal["task", "comment"]] | None = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(search, q, type or ["task", "comment"], limit)
+
+# ==========================
+# ✅ IMPORT / EXPORT ENDPOINTS
+# ==========================
+
+@app.get("/export/{kind}")
+async def export_data(kind: Literal["tasks", "comments", "users"], format: Literal["ndjson", "csv"] = "ndjson", include_deleted: bool = False):
+    return StreamingResponse(
+        export_rows(kind, format, include_deleted),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{format}"'}
+    )
+
+@app.post("/import/{kind}")
+async def import_data(
+    kind: Literal["tasks", "comments", "users"],
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: AsyncSession = Depends(get_async_db)
+):
+    # All rows are inserted in one transaction, so a bad line leaves nothing imported
+    imported = await import_rows(db, kind, read_records(request, format, kind))
+    await db.commit()
+    response_cache.clear()
+    change_feed.notify()
+    if kind == "tasks":
+        ranking_store.invalidate()
+        inference_pool.submit_background(vector_index.sync, key="vector-index-sync")
+    return {"imported": imported}
+
+# ==========================
+# ✅ CHANGE FEED ENDPOINTS
+# ==========================
+
+@app.get("/changes", response_model=ChangesResponse)
+async def get_changes(
+    since: str | None = None,
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Without a cursor only the current one is returned, to take after loading the full lists
+    if since is None:
+        content = empty_changes(await head_position(db))
+    else:
+        content, _ = await read_changes(db, decode_change_cursor(since), limit)
+    return Response(serialize(content, ChangesResponse), media_type="application/json")
+
+@app.get("/changes/stream")
+async def stream_change_feed(request: Request, since: str | None = None, db: AsyncSession = Depends(get_async_db)):
+    # EventSource resends the id of the last event it received when it reconnects
+    since = request.headers.get("last-event-id") or since
+    position = decode_change_cursor(since) if since else None
+    if position is not None:
+        await check_cursor(db, position)
+    return StreamingResponse(
+        stream_changes(position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ==========================
 # ✅ COMMENTS ENDPOINTS
 # ==========================
 
 @app.post("/tasks/{task_id}/comments/", response_model=CommentResponse)
-def add_comment(task_id: int, comment: CommentCreate, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
-    if not task:
+async def add_comment(task_id: int, comment: CommentCreate, db: AsyncSession = Depends(get_async_db)):
+    # One round-trip: a row exists only for a live task, with the author joined in when found
+    row = (await db.execute(
+        select(Task.id, User)
+        .outerjoin(User, User.id == comment.author_id)
+        .where(Task.id == task_id, Task.is_deleted == False)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    user = db.query(User).filter(User.id == comment.author_id).first()
+    user = row.User
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -129,8 +485,10 @@ def add_comment(task_id: int, comment: CommentCreate, db: Session = Depends(get_
         author_id=comment.author_id
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.commit()
+    await db.refresh(new_comment)
+    response_cache.invalidate(f"comments:{task_id}")
+    change_feed.notify()
 
     return CommentResponse(
         id=new_comment.id,
@@ -141,140 +499,190 @@ def add_comment(task_id: int, comment: CommentCreate, db: Session = Depends(get_
     )
 
 @app.get("/tasks/{task_id}/comments/", response_model=list[CommentResponse])
-def get_comments(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+async def get_comments(
+    task_id: int,
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    since_id: int | None = None,
+    since: datetime | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    cache_key, cached = response_cache.lookup(request, [f"task:{task_id}", f"comments:{task_id}"])
+    if cached:
+        return cached
+
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    comments = db.query(Comment).filter(Comment.task_id == task_id).all()
-    return comments
+    # Authors are joined into the same SELECT instead of lazy-loaded per comment
+    query = (
+        select(Comment)
+        .where(Comment.task_id == task_id)
+        .options(joinedload(Comment.author))
+    )
+    # Poll with the id of the newest comment already shown: ids never tie, unlike timestamps
+    if since_id is not None:
+        query = query.where(Comment.id > since_id)
+    if since is not None:
+        # Timestamps have one-second resolution, so comments from that same second are included
+        # again; skipping them could lose one posted right after the previous poll
+        dialect = db.get_bind().dialect.name
+        query = query.where(datetime_key(dialect, Comment.created_at) >= datetime_bound(dialect, since))
+
+    _, cursor_id = decode_cursor(cursor, "id") if cursor else (None, None)
+    query = apply_keyset(query, None, Comment.id, Comment.id, False, None, cursor_id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    comments = (await db.scalars(query)).all()
+    headers = {}
+    if limit is not None and len(comments) > limit:
+        comments = comments[:limit]
+        headers["X-Next-Cursor"] = encode_cursor("id", None, comments[-1].id)
+    return response_cache.store(request, cache_key, comments, list[CommentResponse], headers=headers)
 
 # ==========================
 # ✅ ATTACHMENTS ENDPOINTS
 # ==========================
 
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+@app.post("/tasks/{task_id}/attachments/", response_model=AttachmentResponse, openapi_extra=UPLOAD_OPENAPI)
+async def upload_attachment(task_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # The body is not read until receive_upload, so oversize requests are refused before any upload
+    check_content_length(request)
 
-@app.post("/tasks/{task_id}/attachments/", response_model=AttachmentResponse)
-def upload_attachment(task_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    file_extension = os.path.splitext(file.filename)[1].lower()
-    ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".docx", ".xlsx", ".zip", ".txt", ".csv"}
-
-    if file_extension not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File type '{file_extension}' is not allowed."
-        )
-
-    MAX_FILE_SIZE_MB = 5
-    MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
-    file.file.seek(0, os.SEEK_END)
-    file_size = file.file.tell()
-    file.file.seek(0)
-
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds the limit of {MAX_FILE_SIZE_MB} MB."
-        )
+    upload = await receive_upload(request)
 
-    mime = magic.from_buffer(file.file.read(2048), mime=True)
-    file.file.seek(0)
-
-    ALLOWED_MIME_TYPES = {
-        "image/jpeg",
-        "image/png",
-        "image/gif",
-        "application/pdf",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/zip",
-        "text/plain",
-        "text/csv",
-        "application/vnd.ms-excel"
-    }
-
-    if mime not in ALLOWED_MIME_TYPES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"MIME type '{mime}' is not allowed."
+    # Identical content is stored once; a known blob only gains a reference
+    file_name = blob_name(upload.sha256)
+    try:
+        written = await run_in_threadpool(store_blob, upload)
+        await acquire_blob(db, upload)
+        new_attachment = Attachment(
+            task_id=task_id,
+            original_name=upload.original_name,
+            file_name=file_name,
+            file_url=os.path.join(UPLOAD_DIR, file_name),
+            blob_hash=upload.sha256
         )
-
-    unique_filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}{file_extension}"
-    file_location = os.path.join(UPLOAD_DIR, unique_filename)
-
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    new_attachment = Attachment(
-        task_id=task_id,
-        original_name=file.filename,
-        file_name=unique_filename,
-        file_url=file_location
-    )
-    db.add(new_attachment)
-    db.commit()
-    db.refresh(new_attachment)
+        db.add(new_attachment)
+        await db.commit()
+    except BaseException:
+        await run_in_threadpool(discard_upload, upload)
+        raise
+    await run_in_threadpool(finish_blob, upload)
+    logger.info(f"{'Stored' if written else 'Reused'} blob {file_name} ({upload.size} bytes, {upload.mime})")
+    await db.refresh(new_attachment)
+    response_cache.invalidate(f"attachments:{task_id}")
+    change_feed.notify()
     return new_attachment
 
 @app.get("/tasks/{task_id}/attachments/", response_model=list[AttachmentResponse])
-def get_attachments(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+async def get_attachments(task_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cache_key, cached = response_cache.lookup(request, [f"task:{task_id}", f"attachments:{task_id}"])
+    if cached:
+        return cached
+
+    task = await get_live_task(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    return db.query(Attachment).filter(
+    attachments = await db.scalars(select(Attachment).where(
         Attachment.task_id == task_id,
         Attachment.is_deleted == False
-    ).all()
+    ))
+    return response_cache.store(request, cache_key, attachments.all(), list[AttachmentResponse])
 
 @app.delete("/attachments/{attachment_id}")
-def delete_attachment(attachment_id: int, db: Session = Depends(get_db)):
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
-    if not attachment:
+async def delete_attachment(attachment_id: int, db: AsyncSession = Depends(get_async_db)):
+    attachment = await db.get(Attachment, attachment_id)
+    if not attachment or attachment.is_deleted:
         raise HTTPException(status_code=404, detail="Attachment not found")
 
-    task = db.query(Task).filter(Task.id == attachment.task_id, Task.is_deleted == False).first()
+    task = await get_live_task(db, attachment.task_id)
     if not task:
         raise HTTPException(status_code=400, detail="Cannot delete attachment from a deleted or missing task")
 
-    upload_dir_abs = os.path.abspath(UPLOAD_DIR)
-    file_path_abs = os.path.abspath(attachment.file_url)
-
-    if not file_path_abs.startswith(upload_dir_abs):
-        raise HTTPException(status_code=400, detail="Invalid file path")
-
-    try:
-        if os.path.exists(file_path_abs):
-            os.remove(file_path_abs)
-            logger.info(f"Attachment file deleted: {file_path_abs}")
-        else:
-            logger.warning(f"File not found: {file_path_abs}")
-    except Exception as e:
-        logger.error(f"Failed to delete file: {e}")
-        raise HTTPException(status_code=500, detail=f"Error deleting file: {e}")
-
     attachment.is_deleted = True
-    db.commit()
+    if attachment.blob_hash:
+        # Shared content is removed only once no live attachment references it
+        remove_file = await release_blob(db, attachment.blob_hash)
+        file_path_abs = os.path.abspath(blob_path(attachment.blob_hash))
+    else:
+        remove_file = True
+        file_path_abs = os.path.abspath(attachment.file_url)
+        if not file_path_abs.startswith(os.path.abspath(UPLOAD_DIR)):
+            raise HTTPException(status_code=400, detail="Invalid file path")
+    await db.commit()
+    response_cache.invalidate(f"attachments:{attachment.task_id}")
+    change_feed.notify()
+
+    if remove_file:
+        try:
+            if attachment.blob_hash:
+                # Re-checks the blob, since an upload of the same content may have recorded it again
+                if await remove_blob_file(db, attachment.blob_hash):
+                    logger.info(f"Attachment file deleted: {file_path_abs}")
+            elif await run_in_threadpool(os.path.exists, file_path_abs):
+                await run_in_threadpool(os.remove, file_path_abs)
+                logger.info(f"Attachment file deleted: {file_path_abs}")
+            else:
+                logger.warning(f"File not found: {file_path_abs}")
+        except Exception as e:
+            logger.error(f"Failed to delete file: {e}")
+            raise HTTPException(status_code=500, detail=f"Error deleting file: {e}")
 
     return {"message": "Attachment soft-deleted successfully"}
 
 @app.get("/tasks/{task_id}/attachments/all/", response_model=list[AttachmentResponse])
-def get_all_attachments(task_id: int, db: Session = Depends(get_db)):
-    task = db.query(Task).filter(Task.id == task_id).first()
+async def get_all_attachments(task_id: int, db: AsyncSession = Depends(get_async_db)):
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    return db.query(Attachment).filter(Attachment.task_id == task_id).all()
+    attachments = await db.scalars(select(Attachment).where(Attachment.task_id == task_id))
+    return attachments.all()
+
+@app.get("/uploads/{filename:path}")
+async def get_uploaded_file(filename: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Only files of live attachments are served, with the type recorded at upload
+    row = (await db.execute(
+        select(Attachment.blob_hash, Blob.mime)
+        .outerjoin(Blob, Blob.sha256 == Attachment.blob_hash)
+        .where(Attachment.file_name == filename, Attachment.is_deleted == False)
+        .limit(1)
+    )).first()
+    file_path = upload_path(filename)
+    if not row or not file_path:
+        raise HTTPException(status_code=404, detail="File not found")
 
-@app.get("/uploads/{filename}")
-def get_uploaded_file(filename: str):
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
+    try:
+        stat = await run_in_threadpool(os.stat, file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
\ No newline at end of file
+
+    media_type = row.mime or mimetypes.guess_type(filename)[0]
+    return file_response(request, file_path, stat, media_type=media_type, sha256=row.blob_hash, sendfile_name=filename)
+
+# ==========================
+# ✅ CACHE ENDPOINTS
+# ==========================
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    # Counters are per worker; entries are shared when the Redis backend is used
+    return response_cache.stats()
+
+# ==========================
+# ✅ METRICS ENDPOINTS
+# ==========================
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus text format; like the cache counters, values are per worker
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
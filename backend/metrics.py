@@ -0,0 +1,229 @@
+"""Request, query and inference instrumentation, exported in the Prometheus text format.
+
+MetricsMiddleware times every request under its route template and collects
+the work done for it in a RequestTimings held in a context variable. That
+covers the SQL statements counted by the engine hooks in database.py and the
+inference phases timed with `timer`. Everything is also aggregated in
+process-wide histograms served at /metrics. With TASKAI_SERVER_TIMING=1, each
+response also carries a Server-Timing header with its own breakdown.
+
+Values are per worker process, like the response cache counters.
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("taskai")
+
+# Statements slower than this are logged and counted; 0 turns the check off
+SLOW_QUERY_MS = float(os.getenv("TASKAI_SLOW_QUERY_MS", "200"))
+SERVER_TIMING = os.getenv("TASKAI_SERVER_TIMING", "0") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INFERENCE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._series = {}  # label values -> state
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = [(values, self._snapshot(state)) for values, state in sorted(self._series.items())]
+        for values, state in series:
+            lines.extend(self._render_series(values, state))
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def _snapshot(self, state):
+        return state
+
+    def _render_series(self, values, state):
+        return [f"{self.name}{_labels(self.label_names, values)} {_number(state)}"]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            state = self._series.get(label_values)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                state = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def _snapshot(self, state):
+        return list(state[0]), state[1]
+
+    def _render_series(self, values, state):
+        counts, total = state
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = f'le="{bound if bound == "+Inf" else _number(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, values)} {cumulative}")
+        return lines
+
+_registry = []
+
+http_requests = Counter("taskai_http_requests_total", "HTTP responses by route template and status.", ("method", "route", "status"))
+http_latency = Histogram("taskai_http_request_duration_seconds", "Time until the response was fully sent.", ("method", "route"))
+http_queries = Histogram(
+    "taskai_http_request_queries", "SQL statements run while handling one request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+db_queries = Counter("taskai_db_queries_total", "SQL statements executed.")
+db_latency = Histogram("taskai_db_query_duration_seconds", "SQL statement execution time.")
+db_slow_queries = Counter("taskai_db_slow_queries_total", "SQL statements slower than TASKAI_SLOW_QUERY_MS.")
+inference_latency = Histogram(
+    "taskai_inference_duration_seconds", "Time spent per recommendation phase.", ("phase",), INFERENCE_BUCKETS
+)
+
+class RequestTimings:
+    """Work done on behalf of one request, across the threads it used."""
+
+    __slots__ = ("queries", "query_seconds", "phases")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.phases = {}  # phase -> seconds
+
+    def server_timing(self, total):
+        entries = [f"app;dur={total * 1000:.1f}", f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"']
+        entries.extend(f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items())
+        return ", ".join(entries)
+
+# Copied into threadpool and inference pool jobs, so their work is attributed to the request
+_current = ContextVar("taskai_request_timings", default=None)
+
+def record_query(seconds, statement):
+    db_queries.inc()
+    db_latency.observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.query_seconds += seconds
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        db_slow_queries.inc()
+        logger.warning(f"Slow query ({seconds * 1000:.0f} ms): {' '.join(statement.split())[:500]}")
+
+def record_phase(phase, seconds):
+    inference_latency.observe(seconds, phase)
+    timings = _current.get()
+    if timings is not None:
+        timings.phases[phase] = timings.phases.get(phase, 0.0) + seconds
+
+@contextmanager
+def timer(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """Record latency, status and query count of every HTTP request.
+
+    Everything is recorded once the last body chunk has been sent, before any
+    background work the route runs afterwards. Event streams stay open for as
+    long as the client listens, so they are only counted, not timed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            # The router stores the matched route in the scope; templates keep the label set small
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route, str(status))
+            if not streaming:
+                http_latency.observe(time.perf_counter() - start, method, route)
+                http_queries.observe(timings.queries, method, route)
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                if SERVER_TIMING:
+                    total = time.perf_counter() - start
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", timings.server_timing(total).encode("latin-1"))
+                    ]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # Failed before the response was complete
+            record()
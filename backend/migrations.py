@@ -0,0 +1,180 @@
+"""Versioned schema migrations for databases created before a schema change.
+
+`Base.metadata.create_all` only creates missing tables, so indexes and
+columns added to existing tables are applied here. Each migration runs once
+and is recorded in the `schema_migrations` table. Steps check for existing
+objects first, because a fresh database already gets them from create_all.
+
+Usage:
+    python migrations.py                # apply pending migrations
+    python migrations.py --check-plans  # show query plans of the hot lookups (SQLite)
+"""
+import sys
+import warnings
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from models import Base, Task, Comment, Attachment, Change
+from search import create_search_index
+from changes import add_transaction_ids, create_change_log
+from pagination import apply_keyset
+
+def _find_index(name):
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise LookupError(f"Index '{name}' is not defined in models")
+
+def create_indexes(*names):
+    def migrate(conn):
+        with warnings.catch_warnings():
+            # checkfirst reflects the table's indexes, which skips the SQLite expression ones
+            warnings.filterwarnings("ignore", "Skipped unsupported reflection", SAWarning)
+            for name in names:
+                _find_index(name).create(bind=conn, checkfirst=True)
+    return migrate
+
+def create_sqlite_indexes(*names):
+    """Like create_indexes, for SQLite-only expression indexes that checkfirst cannot see."""
+    def migrate(conn):
+        if conn.dialect.name != "sqlite":
+            return
+        for name in names:
+            conn.execute(CreateIndex(_find_index(name), if_not_exists=True))
+    return migrate
+
+def add_columns(table_name, *column_names):
+    def migrate(conn):
+        table = Base.metadata.tables[table_name]
+        existing = {column["name"] for column in inspect(conn).get_columns(table_name)}
+        for name in column_names:
+            if name not in existing:
+                column = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column}"))
+    return migrate
+
+def steps(*migrations):
+    def migrate(conn):
+        for migration in migrations:
+            migration(conn)
+    return migrate
+
+MIGRATIONS = [
+    (
+        1,
+        "Index live tasks by status, priority and dates; comments and attachments by task",
+        create_indexes(
+            "ix_tasks_deleted_status",
+            "ix_tasks_deleted_created_at",
+            "ix_tasks_deleted_updated_at",
+            "ix_tasks_live_status_priority",
+            "ix_comments_task_id_id",
+            "ix_attachments_task_id_deleted",
+        ),
+    ),
+    (
+        2,
+        "Reference content-addressed blobs from attachments",
+        add_columns("attachments", "blob_hash"),
+    ),
+    (
+        3,
+        "Index attachments by stored file name",
+        create_indexes("ix_attachments_file_name_deleted"),
+    ),
+    (
+        4,
+        "Full-text search index over task and comment text",
+        create_search_index,
+    ),
+    (
+        5,
+        "Log task, comment and attachment changes for the change feed",
+        create_change_log,
+    ),
+    (
+        6,
+        "Order the change log by writing transaction on PostgreSQL",
+        steps(add_columns("changes", "txid"), add_transaction_ids),
+    ),
+    (
+        7,
+        "Index task and change log timestamps as compared on SQLite",
+        create_sqlite_indexes("ix_tasks_deleted_created_key", "ix_tasks_deleted_updated_key", "ix_changes_created_key"),
+    ),
+]
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+        print(f"✅ Applied migration {version}: {description}")
+
+# Lookups on the request path that must stay index-only as the tables grow
+HOT_QUERIES = {
+    "task detail": select(Task).where(Task.id == 1, Task.is_deleted == False),
+    "tasks by status and priority": select(Task).where(
+        Task.is_deleted == False, Task.status == "Pending", Task.priority == 1
+    ),
+    "tasks by update time, after a cursor": apply_keyset(
+        select(Task.id).where(Task.is_deleted == False), "sqlite", Task.updated_at, Task.id, True, "2026-01-01T00:00:00", 1
+    ).limit(50),
+    "task counts by status": select(Task.status, func.count()).where(Task.is_deleted == False).group_by(Task.status),
+    "comments of a task": select(Comment).where(Comment.task_id == 1).order_by(Comment.id),
+    "attachments of a task": select(Attachment).where(Attachment.task_id == 1, Attachment.is_deleted == False),
+    "full-text task search": text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH '\"desain\"*'"),
+    "attachment by file name": select(Attachment.id).where(Attachment.file_name == "ab/cd/abcd", Attachment.is_deleted == False),
+    "change log after a cursor": select(Change.id, Change.entity, Change.entity_id).where(Change.id > 1).order_by(Change.id),
+}
+
+def query_plans(engine):
+    """Return {name: [plan detail lines]} from SQLite's EXPLAIN QUERY PLAN."""
+    plans = {}
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            sql = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+            plans[name] = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return plans
+
+def full_scans(plans):
+    """Plan lines that read a table without an index or primary key lookup."""
+    return {
+        name: [line for line in lines if line.startswith("SCAN") and "INDEX" not in line]
+        for name, lines in plans.items()
+        if any(line.startswith("SCAN") and "INDEX" not in line for line in lines)
+    }
+
+if __name__ == "__main__":
+    from database import engine, init_db
+
+    # Creates missing tables first, so a fresh database can be migrated too
+    init_db()
+
+    if "--check-plans" in sys.argv:
+        if engine.dialect.name != "sqlite":
+            sys.exit("Query plan check is only implemented for SQLite")
+        plans = query_plans(engine)
+        for name, lines in plans.items():
+            print(f"{name}:")
+            for line in lines:
+                print(f"    {line}")
+        scans = full_scans(plans)
+        if scans:
+            sys.exit(f"❌ Full table scans in: {', '.join(scans)}")
+        print("✅ All hot queries use an index")
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, DateTime, Text, ForeignKey, LargeBinary, Index, UniqueConstraint, func, literal_column, select
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+def sqlite_datetime(column):
+    """A DateTime column as one text format on SQLite, whichever format a row was written in."""
+    # CURRENT_TIMESTAMP writes "YYYY-MM-DD HH:MM:SS", SQLAlchemy binds add microseconds.
+    # The format is inlined rather than bound, so queries match the expression indexes below
+    return func.strftime(literal_column("'%Y-%m-%d %H:%M:%f'"), column)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -16,6 +22,12 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Statistics group the live tasks by status and by created/updated day
+        Index("ix_tasks_deleted_status", "is_deleted", "status"),
+        Index("ix_tasks_deleted_created_at", "is_deleted", "created_at"),
+        Index("ix_tasks_deleted_updated_at", "is_deleted", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
@@ -33,9 +45,13 @@ class Task(Base):
     # Relationship
     comments = relationship("Comment", back_populates="task", cascade="all, delete-orphan")
     attachments = relationship("Attachment", back_populates="task", cascade="all, delete-orphan")
+    embeddings = relationship("TaskEmbedding", back_populates="task", cascade="all, delete-orphan")
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_task_id_id", "task_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
@@ -49,14 +65,84 @@ class Comment(Base):
 
 class Attachment(Base):
     __tablename__ = "attachments"
+    __table_args__ = (
+        Index("ix_attachments_task_id_deleted", "task_id", "is_deleted"),
+        # Downloads check that a requested file belongs to a live attachment
+        Index("ix_attachments_file_name_deleted", "file_name", "is_deleted"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"))
     original_name = Column(String(255), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_url = Column(Text, nullable=False)
+    blob_hash = Column(String(64), ForeignKey("blobs.sha256"), nullable=True)  # NULL for files stored before deduplication
     uploaded_at = Column(DateTime, server_default=func.now())
     is_deleted = Column(Boolean, default=False)
 
     # Relationship
     task = relationship("Task", back_populates="attachments")
+    blob = relationship("Blob")
+
+class Blob(Base):
+    """Uploaded file content, stored once under its SHA-256 and shared by attachments."""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    mime = Column(String(127), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # live attachments pointing at this blob
+    created_at = Column(DateTime, server_default=func.now())
+
+# Content type sniffed at upload, loaded with every attachment; None for files stored before deduplication
+Attachment.mime = column_property(
+    select(Blob.mime).where(Blob.sha256 == Attachment.blob_hash).correlate_except(Blob).scalar_subquery()
+)
+
+# Partial index over live tasks only, for status/priority filtering
+Index(
+    "ix_tasks_live_status_priority",
+    Task.status,
+    Task.priority,
+    sqlite_where=Task.is_deleted == False,
+    postgresql_where=Task.is_deleted == False,
+)
+
+# SQLite compares timestamps through sqlite_datetime (see pagination.py), which these index
+Index("ix_tasks_deleted_created_key", Task.is_deleted, sqlite_datetime(Task.created_at)).ddl_if(dialect="sqlite")
+Index("ix_tasks_deleted_updated_key", Task.is_deleted, sqlite_datetime(Task.updated_at)).ddl_if(dialect="sqlite")
+
+class TaskEmbedding(Base):
+    __tablename__ = "task_embeddings"
+    __table_args__ = (UniqueConstraint("task_id", "field", "model"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    field = Column(String(32), nullable=False)
+    model = Column(String(255), nullable=False)
+    text_hash = Column(String(64), nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32, L2-normalized
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    # Relationship
+    task = relationship("Task", back_populates="embeddings")
+
+class Change(Base):
+    """Append-only log of inserts, updates and deletes, written by database triggers (see changes.py)."""
+    __tablename__ = "changes"
+    # AUTOINCREMENT keeps ids from being reused after old entries are pruned, since ids are cursors
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(16), nullable=False)  # "task", "comment" or "attachment"
+    entity_id = Column(Integer, nullable=False)
+    task_id = Column(Integer, nullable=False)
+    action = Column(String(16), nullable=False)  # "created", "updated" or "deleted"
+    # Writing transaction on PostgreSQL, which orders the feed there (see changes.py); 0 on SQLite
+    txid = Column(BigInteger, nullable=False, server_default="0")
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+
+# Only plain columns attach an index to its table, so this one is appended explicitly
+Change.__table__.append_constraint(
+    Index("ix_changes_created_key", sqlite_datetime(Change.created_at)).ddl_if(dialect="sqlite")
+)
@@ -0,0 +1,75 @@
+import json
+import base64
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from sqlalchemy import String, literal, tuple_
+from models import sqlite_datetime
+
+def encode_cursor(sort, value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return value, row_id
+
+def parse_sort(sort, columns):
+    """Split "-field" / "field" into (field, descending), rejecting unknown fields."""
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    if field not in columns:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{field}'")
+    return field, descending
+
+def datetime_key(dialect_name, column):
+    """A DateTime column as datetime_bound values compare against it on the given backend."""
+    if dialect_name == "sqlite":
+        # Rows hold whatever text their writer used, which does not always sort as timestamps
+        return sqlite_datetime(column)
+    return column
+
+def naive_utc(value):
+    """Columns hold naive UTC; convert datetimes that carry an offset."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def datetime_bound(dialect_name, value):
+    """Bind a datetime for comparison against datetime_key of a DateTime column."""
+    value = naive_utc(value)
+    if dialect_name == "sqlite":
+        return sqlite_datetime(literal(value.isoformat(sep=" ", timespec="microseconds"), String))
+    return value
+
+def _position_value(dialect_name, column, value):
+    if value is None or column.type.python_type is not datetime:
+        return value
+    return datetime_bound(dialect_name, datetime.fromisoformat(value))
+
+def apply_keyset(stmt, dialect_name, sort_column, id_column, descending, cursor_value, cursor_id):
+    """Order by (sort column, id) and continue strictly after the cursor position."""
+    if sort_column is id_column:
+        if cursor_id is not None:
+            stmt = stmt.where(id_column < cursor_id if descending else id_column > cursor_id)
+        return stmt.order_by(id_column.desc() if descending else id_column.asc())
+
+    position_value = _position_value(dialect_name, sort_column, cursor_value)
+    if sort_column.type.python_type is datetime:
+        sort_column = datetime_key(dialect_name, sort_column)
+
+    if cursor_id is not None:
+        keys = tuple_(sort_column, id_column)
+        position = tuple_(position_value, literal(cursor_id))
+        stmt = stmt.where(keys < position if descending else keys > position)
+
+    if descending:
+        return stmt.order_by(sort_column.desc(), id_column.desc())
+    return stmt.order_by(sort_column.asc(), id_column.asc())
@@ -0,0 +1,172 @@
+import os
+import time
+import heapq
+import bisect
+import logging
+import threading
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+from ai import MODE_WEIGHTS, score_tasks
+from database import SessionLocal
+from embedding_cache import get_task_embeddings
+from metrics import timer
+from models import Task
+from schemas import TaskResponse
+
+logger = logging.getLogger("taskai")
+
+# Rankings live in process memory. Writes made through another worker only
+# show up here once the ranking is rebuilt, so cap how long one may be reused.
+RANKING_MAX_AGE = float(os.getenv("TASKAI_RANKING_MAX_AGE", "300"))
+# Writes touching more tasks than this drop the rankings instead of rescoring each task
+BULK_REBUILD_THRESHOLD = 500
+
+def normalize_mode(mode):
+    # Unknown modes score exactly like "urgent", so they share its ranking
+    return mode if mode in MODE_WEIGHTS else "urgent"
+
+class Ranking:
+    """Tasks of one mode kept sorted by descending score, ties broken by id.
+
+    The order is also kept per (status, priority), so a filtered page merges
+    the matching groups and reads only as far as the page, like the full one.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.version = 0
+        self.updated_at = None
+        self.built_at = time.monotonic()
+        self._order = []    # (-score, task_id)
+        self._groups = {}   # (status, priority) -> [(-score, task_id)]
+        self._entries = {}  # task_id -> (sort key, TaskResponse)
+        self._lock = threading.Lock()
+
+    def load(self, tasks, scores):
+        self._entries = {
+            task.id: ((-float(score), task.id), TaskResponse.from_orm(task))
+            for task, score in zip(tasks, scores)
+        }
+        self._order = sorted(key for key, _ in self._entries.values())
+        self._groups = {}
+        for key in self._order:
+            task = self._entries[key[1]][1]
+            self._groups.setdefault((task.status, task.priority), []).append(key)
+
+    def upsert(self, task, score):
+        key = (-float(score), task.id)
+        entry = TaskResponse.from_orm(task)
+        with self._lock:
+            self._discard(task.id)
+            bisect.insort(self._order, key)
+            bisect.insort(self._groups.setdefault((entry.status, entry.priority), []), key)
+            self._entries[task.id] = (key, entry)
+
+    def remove(self, task_id):
+        with self._lock:
+            self._discard(task_id)
+
+    def _discard(self, task_id):
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            key, task = entry
+            del self._order[bisect.bisect_left(self._order, key)]
+            group = self._groups[(task.status, task.priority)]
+            del group[bisect.bisect_left(group, key)]
+            if not group:
+                del self._groups[(task.status, task.priority)]
+
+    def page(self, limit, offset=0, status=None, priority=None, exclude_completed=False):
+        with self._lock:
+            if not (status or priority or exclude_completed):
+                keys = self._order[offset:offset + limit]
+            else:
+                groups = [
+                    keys for (task_status, task_priority), keys in self._groups.items()
+                    if (not status or task_status in status)
+                    and (not priority or task_priority in priority)
+                    and not (exclude_completed and task_status == "Completed")
+                ]
+                keys = list(islice(heapq.merge(*groups), offset, offset + limit))
+            return [self._entries[task_id][1] for _, task_id in keys]
+
+class RankingStore:
+    """Materialized recommendation rankings, updated one task at a time on writes."""
+
+    def __init__(self):
+        self._rankings = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._stale_before = 0.0  # rankings built before this are not served
+
+    def get(self, mode):
+        ranking = self._rankings.get(normalize_mode(mode))
+        if ranking is None or ranking.built_at <= self._stale_before or time.monotonic() - ranking.built_at > RANKING_MAX_AGE:
+            return None
+        return ranking
+
+    def build(self, mode):
+        """Score every task for a mode from scratch; runs on the inference pool."""
+        mode = normalize_mode(mode)
+        # Held for the whole build so task writes committed meanwhile are applied after it
+        with self._lock, timer("ranking_build"):
+            started = time.monotonic()
+            db = SessionLocal()
+            try:
+                tasks = db.query(Task).filter(Task.is_deleted == False).order_by(Task.id).all()
+                scores = score_tasks(tasks, mode, embed=partial(get_task_embeddings, db))
+                ranking = Ranking(mode)
+                ranking.load(tasks, scores)
+                # Aged from when the tasks were read, so invalidate() also covers a build in progress
+                ranking.built_at = started
+            finally:
+                db.close()
+
+            self._version += 1
+            self._stamp(ranking)
+            self._rankings[mode] = ranking
+            logger.info(f"Built '{mode}' ranking for {len(tasks)} tasks")
+            return ranking
+
+    def apply_task_write(self, *task_ids):
+        """Rescore tasks in every materialized ranking after they were created, updated or deleted."""
+        with self._lock:
+            if not self._rankings:
+                return
+            if len(task_ids) > BULK_REBUILD_THRESHOLD:
+                # Cheaper to rescore everything on the next read than to insert one by one
+                self._rankings.clear()
+                return
+            db = SessionLocal()
+            try:
+                tasks = db.query(Task).filter(Task.id.in_(task_ids), Task.is_deleted == False).all()
+                removed = set(task_ids) - {task.id for task in tasks}
+                self._version += 1
+                for mode, ranking in self._rankings.items():
+                    for task_id in removed:
+                        ranking.remove(task_id)
+                    if tasks:
+                        scores = score_tasks(tasks, mode, embed=partial(get_task_embeddings, db))
+                        for task, score in zip(tasks, scores):
+                            ranking.upsert(task, score)
+                    self._stamp(ranking)
+            except Exception as e:
+                # Rebuild on the next read rather than serve a ranking that missed this write
+                logger.error(f"Failed to update rankings for tasks {', '.join(map(str, task_ids))}: {e}")
+                self._rankings.clear()
+            finally:
+                db.close()
+
+    def invalidate(self):
+        """Stop serving every ranking, e.g. after an import; they are rebuilt on the next read.
+
+        Does not take the lock, so it never waits for a build in progress.
+        """
+        self._stale_before = time.monotonic()
+
+    def _stamp(self, ranking):
+        ranking.version = self._version
+        ranking.updated_at = datetime.now(timezone.utc)
+
+ranking_store = RankingStore()
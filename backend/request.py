@@ -111,14 +111,14 @@ tasks = [
 task_ids = []
 
 print("📌 Menambahkan tugas...")
-for task in tasks:
-    response = requests.post(TASKS_URL, json=task, headers=HEADERS)
-    if response.status_code == 200:
-        task_id = response.json()["id"]
-        task_ids.append(task_id)
-        print(f"✅ Task {task_id} ditambahkan: {task['title']}")
-    else:
-        print(f"❌ Gagal menambahkan task: {task['title']}", response.text)
+# Satu request dan satu transaksi untuk semua tugas
+response = requests.post(f"{TASKS_URL}bulk", json={"create": tasks}, headers=HEADERS)
+if response.status_code == 200:
+    for task in response.json()["created"]:
+        task_ids.append(task["id"])
+        print(f"✅ Task {task['id']} ditambahkan: {task['title']}")
+else:
+    print("❌ Gagal menambahkan tugas", response.text)
 
 print("\n📌 Mengambil semua tugas...")
 response = requests.get(TASKS_URL)
@@ -0,0 +1,213 @@
+"""Cache of serialized GET responses, invalidated by the handlers that write.
+
+Every cached response is filed under tags such as "tasks" or "task:5". A key
+embeds the current generation of each of its tags, so invalidating a tag only
+bumps its generation and older entries are never read again; they age out by
+TTL or LRU eviction. That needs nothing but get/set/incr from the backend, so
+the in-process store can be swapped for a shared one (TASKAI_CACHE_URL=redis://...)
+to make invalidation visible to every worker.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+import orjson
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+# Seconds a response may be served from the cache; 0 disables caching
+RESPONSE_CACHE_TTL = float(os.getenv("TASKAI_RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("TASKAI_RESPONSE_CACHE_SIZE", "1024"))
+CACHE_URL = os.getenv("TASKAI_CACHE_URL", "")
+
+# Keys of stored responses; the generation counters live under "gen:"
+RESPONSE_PREFIX = "resp:"
+
+class CacheBackend(ABC):
+    """Storage behind ResponseCache. Counters written with incr must not be evicted."""
+
+    name = "custom"
+
+    @abstractmethod
+    def get(self, key):
+        """The value stored under key, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value: bytes, ttl):
+        """Store value under key for ttl seconds; it may be evicted earlier."""
+
+    @abstractmethod
+    def get_counters(self, keys):
+        """Current values of counters, 0 for ones never incremented."""
+
+    @abstractmethod
+    def incr(self, key):
+        """Add one to a counter, creating it at 1."""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of stored responses, without the counters; may include expired ones not yet dropped."""
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU with per-entry expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counters(self, keys):
+        return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+class RedisBackend(CacheBackend):
+    """Shared backend for several workers; needs the `redis` package."""
+
+    name = "redis"
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, px=max(int(ttl * 1000), 1))
+
+    def get_counters(self, keys):
+        return [int(value or 0) for value in self._client.mget(keys)]
+
+    def incr(self, key):
+        self._client.incr(key)
+
+    def __len__(self):
+        # The database may be shared with the counters and other applications; stats only, so a SCAN is fine
+        return sum(1 for _ in self._client.scan_iter(match=f"{RESPONSE_PREFIX}*", count=1000))
+
+def create_backend():
+    if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(CACHE_URL)
+    return MemoryBackend(RESPONSE_CACHE_SIZE)
+
+@lru_cache(maxsize=None)
+def _adapter(model):
+    return TypeAdapter(model)
+
+def serialize(content, model=None):
+    """JSON bytes of content, validated once against model when given.
+
+    Without a model, content must be plain dicts, lists and scalars (datetimes included).
+    """
+    if model is None:
+        return orjson.dumps(content)
+    adapter = _adapter(model)
+    return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+def _etag(body):
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def _etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    return header is not None and (header.strip() == "*" or etag in (tag.strip() for tag in header.split(",")))
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def lookup(self, request: Request, tags):
+        """Return (key, cached response or None) for a GET request filed under tags."""
+        if not self.enabled:
+            return None, None
+        generations = self.backend.get_counters(["gen:*"] + [f"gen:{tag}" for tag in tags])
+        query = "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items()))
+        key = f"{RESPONSE_PREFIX}{':'.join(map(str, generations))}:{request.url.path}?{query}"
+
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return key, None
+        self.hits += 1
+        meta, body = value.split(b"\n", 1)
+        meta = json.loads(meta)
+        return key, self._response(request, body, meta["etag"], meta["headers"])
+
+    def store(self, request: Request, key, content, model=None, headers=None):
+        """Serialize content, cache it under key (from lookup) and return it as a response."""
+        body = serialize(content, model)
+        etag = _etag(body)
+        headers = headers or {}
+        if key is not None:
+            meta = json.dumps({"etag": etag, "headers": headers}).encode()
+            self.backend.set(key, meta + b"\n" + body, self.ttl)
+        return self._response(request, body, etag, headers)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.incr(f"gen:{tag}")
+
+    def clear(self):
+        """Invalidate every cached response, e.g. after an import."""
+        self.backend.incr("gen:*")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _response(self, request, body, etag, headers):
+        # no-cache lets browsers keep the body but revalidate it with If-None-Match every time
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+response_cache = ResponseCache(create_backend(), RESPONSE_CACHE_TTL)
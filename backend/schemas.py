@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 
 class UserCreate(BaseModel):
     username: str
@@ -41,6 +41,42 @@ class TaskResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SimilarTaskResponse(TaskResponse):
+    score: float  # cosine similarity of the title embeddings
+
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+class TaskBulkRequest(BaseModel):
+    create: list[TaskCreate] = []
+    update: list[TaskBulkUpdate] = []
+    delete: list[int] = []
+
+class TaskBulkResponse(BaseModel):
+    created: list[TaskResponse]
+    updated: list[TaskResponse]
+    deleted: list[int]
+
+class PriorityStats(BaseModel):
+    priority: int
+    count: int
+    average_progress: float
+
+class DailyTaskStats(BaseModel):
+    date: date
+    created: int
+    completed: int
+    average_progress: float
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    completed: int  # status "Completed"
+    fully_progressed: int  # progress 100, whatever the status
+    average_progress: float
+    by_status: dict[str, int]
+    by_priority: list[PriorityStats]
+    daily: list[DailyTaskStats]
+
 class CommentCreate(BaseModel):
     content: str
     author_id: int
@@ -55,6 +91,30 @@ class CommentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SearchResult(BaseModel):
+    type: str  # "task" or "comment"
+    id: int
+    task_id: int
+    title: str
+    snippet: str  # HTML-escaped text with matches wrapped in <mark>
+    score: float
+
+class ImportedRow(BaseModel):
+    # Rows keep their ids and timestamps when given, so an export can be loaded into an empty database
+    id: int | None = None
+    created_at: datetime | None = None
+
+class UserImport(ImportedRow, UserCreate):
+    pass
+
+class TaskImport(ImportedRow, TaskCreate):
+    updated_at: datetime | None = None
+    is_deleted: bool = False
+
+class CommentImport(ImportedRow, CommentCreate):
+    task_id: int
+    author_id: int | None = None  # exported as null once the author is deleted
+
 class AttachmentCreate(BaseModel):
     file_name: str
     file_url: str
@@ -65,7 +125,22 @@ class AttachmentResponse(BaseModel):
     original_name: str
     file_name: str
     file_url: str
+    mime: str | None = None  # stored names carry no extension, so previews go by this
     uploaded_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DeletedIds(BaseModel):
+    tasks: list[int] = []
+    comments: list[int] = []
+    attachments: list[int] = []
+
+class ChangesResponse(BaseModel):
+    # Current state of everything created or updated after the cursor
+    tasks: list[TaskResponse]
+    comments: list[CommentResponse]
+    attachments: list[AttachmentResponse]
+    deleted: DeletedIds
+    cursor: str  # pass as `since` on the next call
+    has_more: bool
@@ -0,0 +1,153 @@
+"""Full-text search over task and comment text.
+
+SQLite uses FTS5 tables kept in sync with `tasks` and `comments` by triggers;
+PostgreSQL uses stored tsvector columns with GIN indexes. Both are created by
+migration 4 (`create_search_index`), so rows written through any path, bulk
+inserts and imports included, are searchable without hooks in the handlers.
+"""
+import os
+import re
+import html
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from schemas import SearchResult
+
+# Text search configuration used on PostgreSQL; "simple" does no stemming, which suits mixed-language text
+SEARCH_LANGUAGE = os.getenv("TASKAI_SEARCH_LANGUAGE", "simple")
+
+# Task titles count this many times more than descriptions when ranking
+TITLE_WEIGHT = 4.0
+
+SNIPPET_TOKENS = 12
+
+# Highlight markers that cannot appear in user text; swapped for <mark> after escaping
+_START, _STOP = "\x02", "\x03"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5("
+    "content, content='comments', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_insert AFTER INSERT ON comments BEGIN "
+    "INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_delete AFTER DELETE ON comments BEGIN "
+    "INSERT INTO comments_fts(comments_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS comments_fts_update AFTER UPDATE OF content ON comments BEGIN "
+    "INSERT INTO comments_fts(comments_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO comments_fts(rowid, content) VALUES (new.id, new.content); END",
+    "INSERT INTO comments_fts(comments_fts) VALUES ('rebuild')",
+]
+
+POSTGRESQL_SEARCH_DDL = [
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING gin (search_vector)",
+    "ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"to_tsvector('{SEARCH_LANGUAGE}', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_comments_search_vector ON comments USING gin (search_vector)",
+]
+
+def create_search_index(conn):
+    """Migration step: build the full-text index for the connected backend."""
+    statements = {"sqlite": SQLITE_SEARCH_DDL, "postgresql": POSTGRESQL_SEARCH_DDL}.get(conn.dialect.name)
+    if statements is None:
+        print(f"⚠️ Full-text search is not available on {conn.dialect.name}")
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+def query_terms(q):
+    """Words of a free-text query; each one must match, as a prefix of a word."""
+    return _TOKEN.findall(q.lower())
+
+def _highlight(snippet):
+    return html.escape(snippet or "").replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+def _sqlite_queries(terms):
+    # Quoted terms keep FTS5 operators in user input from being interpreted
+    match = " ".join(f'"{term}"*' for term in terms)
+    tasks = text(
+        "SELECT t.id, t.id AS task_id, t.title, "
+        f"snippet(tasks_fts, -1, '{_START}', '{_STOP}', '…', {SNIPPET_TOKENS}) AS snippet, "
+        f"-bm25(tasks_fts, {TITLE_WEIGHT}, 1.0) AS score "
+        "FROM tasks_fts JOIN tasks t ON t.id = tasks_fts.rowid "
+        "WHERE tasks_fts MATCH :match AND t.is_deleted = 0 "
+        "ORDER BY score DESC, t.id LIMIT :limit"
+    )
+    comments = text(
+        "SELECT c.id, c.task_id, t.title, "
+        f"snippet(comments_fts, 0, '{_START}', '{_STOP}', '…', {SNIPPET_TOKENS}) AS snippet, "
+        "-bm25(comments_fts) AS score "
+        "FROM comments_fts JOIN comments c ON c.id = comments_fts.rowid JOIN tasks t ON t.id = c.task_id "
+        "WHERE comments_fts MATCH :match AND t.is_deleted = 0 "
+        "ORDER BY score DESC, c.id LIMIT :limit"
+    )
+    return match, tasks, comments
+
+def _postgresql_queries(terms):
+    match = " & ".join(f"{term}:*" for term in terms)
+    headline = f"'StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_TOKENS}, MinWords=3'"
+    tasks = text(
+        "SELECT t.id, t.id AS task_id, t.title, "
+        f"ts_headline('{SEARCH_LANGUAGE}', t.title || ' — ' || t.description, q, {headline}) AS snippet, "
+        "ts_rank(t.search_vector, q) AS score "
+        f"FROM tasks t, to_tsquery('{SEARCH_LANGUAGE}', :match) q "
+        "WHERE t.search_vector @@ q AND t.is_deleted = false "
+        "ORDER BY score DESC, t.id LIMIT :limit"
+    )
+    comments = text(
+        "SELECT c.id, c.task_id, t.title, "
+        f"ts_headline('{SEARCH_LANGUAGE}', c.content, q, {headline}) AS snippet, "
+        "ts_rank(c.search_vector, q) AS score "
+        f"FROM comments c JOIN tasks t ON t.id = c.task_id, to_tsquery('{SEARCH_LANGUAGE}', :match) q "
+        "WHERE c.search_vector @@ q AND t.is_deleted = false "
+        "ORDER BY score DESC, c.id LIMIT :limit"
+    )
+    return match, tasks, comments
+
+def search(db: Session, q, types=("task", "comment"), limit=20):
+    """Rank live tasks and their comments matching every word of q; snippets are HTML-escaped with <mark> highlights."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match, tasks_query, comments_query = _sqlite_queries(terms)
+    elif dialect == "postgresql":
+        match, tasks_query, comments_query = _postgresql_queries(terms)
+    else:
+        raise HTTPException(status_code=501, detail=f"Full-text search is not available on {dialect}")
+
+    results = []
+    for result_type, query in (("task", tasks_query), ("comment", comments_query)):
+        if result_type not in types:
+            continue
+        results += [
+            SearchResult(
+                type=result_type,
+                id=row.id,
+                task_id=row.task_id,
+                title=row.title,
+                snippet=_highlight(row.snippet),
+                score=float(row.score)
+            )
+            for row in db.execute(query, {"match": match, "limit": limit})
+        ]
+
+    # Each table is ranked on its own; interleave the best of both
+    results.sort(key=lambda result: result.score, reverse=True)
+    return results[:limit]
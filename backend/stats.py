@@ -0,0 +1,108 @@
+import os
+import time
+import threading
+from datetime import date, datetime
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from models import Task
+from pagination import datetime_bound, datetime_key
+from schemas import DailyTaskStats, PriorityStats, TaskStatsResponse
+
+# Seconds a computed statistics payload is reused; 0 disables the cache
+STATS_CACHE_TTL = float(os.getenv("TASKAI_STATS_CACHE_TTL", "10"))
+_STATS_CACHE_SIZE = 64
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _day(column):
+    return func.date(column)
+
+def _as_date(value):
+    # SQLite returns date() as text, PostgreSQL as a date
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def compute_task_stats(db: Session, start: date, end: date, updated_after: datetime | None = None):
+    """Aggregate live tasks with GROUP BY queries; daily counts cover start..end inclusive."""
+    dialect = db.get_bind().dialect.name
+    base = db.query(Task).filter(Task.is_deleted == False)
+    if updated_after is not None:
+        base = base.filter(datetime_key(dialect, Task.updated_at) >= datetime_bound(dialect, updated_after))
+    live = base.subquery()
+
+    by_status = dict(db.query(live.c.status, func.count()).group_by(live.c.status).all())
+
+    by_priority = [
+        PriorityStats(priority=priority, count=count, average_progress=float(avg or 0))
+        for priority, count, avg in db.query(
+            live.c.priority, func.count(), func.avg(live.c.progress)
+        ).group_by(live.c.priority).order_by(live.c.priority)
+    ]
+
+    total = sum(by_status.values())
+    average_progress, fully_progressed = db.query(
+        func.avg(live.c.progress), func.sum(case((live.c.progress == 100, 1), else_=0))
+    ).one()
+
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end, datetime.max.time())
+
+    created = dict(
+        (_as_date(day), count) for day, count in db.query(_day(live.c.created_at), func.count()).filter(
+            datetime_key(dialect, live.c.created_at) >= datetime_bound(dialect, window_start),
+            datetime_key(dialect, live.c.created_at) <= datetime_bound(dialect, window_end)
+        ).group_by(_day(live.c.created_at))
+    )
+
+    # There is no completion timestamp, so a completed task counts on the day it was last updated
+    updated = {
+        _as_date(day): (completed, avg)
+        for day, completed, avg in db.query(
+            _day(live.c.updated_at),
+            func.sum(case((live.c.status == "Completed", 1), else_=0)),
+            func.avg(live.c.progress)
+        ).filter(
+            datetime_key(dialect, live.c.updated_at) >= datetime_bound(dialect, window_start),
+            datetime_key(dialect, live.c.updated_at) <= datetime_bound(dialect, window_end)
+        ).group_by(_day(live.c.updated_at))
+    }
+
+    daily = []
+    for offset in range((end - start).days + 1):
+        day = date.fromordinal(start.toordinal() + offset)
+        completed, avg = updated.get(day, (0, None))
+        daily.append(DailyTaskStats(
+            date=day,
+            created=created.get(day, 0),
+            completed=completed or 0,
+            average_progress=float(avg or 0)
+        ))
+
+    return TaskStatsResponse(
+        total=total,
+        completed=by_status.get("Completed", 0),
+        fully_progressed=fully_progressed or 0,
+        average_progress=float(average_progress or 0),
+        by_status=by_status,
+        by_priority=by_priority,
+        daily=daily
+    )
+
+def get_task_stats(db: Session, start: date, end: date, updated_after: datetime | None = None):
+    """compute_task_stats behind a short TTL cache shared by all requests of this process."""
+    if STATS_CACHE_TTL <= 0:
+        return compute_task_stats(db, start, end, updated_after)
+
+    key = (start, end, updated_after)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    stats = compute_task_stats(db, start, end, updated_after)
+    with _cache_lock:
+        if len(_cache) >= _STATS_CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = (now + STATS_CACHE_TTL, stats)
+    return stats
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from models import Attachment, Base, Blob, Task
+from schemas import AttachmentResponse
+from uploads import blob_name
+
+SHA256 = "ab" * 32
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'attachments.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Task.__table__), [{"id": 1, "title": "t", "description": "", "priority": 1, "status": "Pending", "progress": 0}])
+        conn.execute(insert(Blob.__table__), [{"sha256": SHA256, "size": 4, "mime": "image/png", "ref_count": 1}])
+        conn.execute(insert(Attachment.__table__), [
+            {"id": 1, "task_id": 1, "original_name": "photo.png", "file_name": blob_name(SHA256),
+             "file_url": f"uploads/{blob_name(SHA256)}", "blob_hash": SHA256},
+            # Stored before deduplication, under a name that kept its extension
+            {"id": 2, "task_id": 1, "original_name": "scan.pdf", "file_name": "5f1c.pdf", "file_url": "uploads/5f1c.pdf",
+             "blob_hash": None},
+        ])
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_blob_attachments_carry_their_mime_type(session):
+    attachments = session.scalars(select(Attachment).order_by(Attachment.id)).all()
+    responses = [AttachmentResponse.model_validate(attachment) for attachment in attachments]
+
+    # The stored name has no extension to preview by, the type stands in for it
+    assert "." not in responses[0].file_name
+    assert responses[0].mime == "image/png"
+    assert responses[1].mime is None and responses[1].file_name.endswith(".pdf")
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import bulk
+from models import Base, Comment, Task, User
+from pagination import apply_keyset, decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+STAMP = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class Body:
+    """The part of a Request that read_records uses."""
+
+    def __init__(self, content):
+        self.content = content.encode()
+
+    async def stream(self):
+        # Uneven chunks, so lines and quoted values are split across them
+        for start in range(0, len(self.content), 7):
+            yield self.content[start:start + 7]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    engines = []
+
+    def make(name):
+        url = tmp_path / f"{name}.db"
+        sync_engine = create_engine(f"sqlite:///{url}")
+        Base.metadata.create_all(bind=sync_engine)
+        engines.append(sync_engine)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{url}")
+        engines.append(engine.sync_engine)
+        return sync_engine, async_sessionmaker(engine, expire_on_commit=False)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+async def export(monkeypatch, sessions, kind, fmt):
+    monkeypatch.setattr(bulk, "AsyncSessionLocal", sessions)
+    return "".join([chunk async for chunk in bulk.export_rows(kind, fmt, include_deleted=True)])
+
+
+async def load(sessions, kind, fmt, content):
+    async with sessions() as db:
+        count = await bulk.import_rows(db, kind, bulk.read_records(Body(content), fmt, kind))
+        await db.commit()
+    return count
+
+
+def dump(engine):
+    with engine.connect() as conn:
+        return {
+            model.__tablename__: [tuple(row) for row in conn.execute(select(model.__table__).order_by(model.id))]
+            for model in (User, Task, Comment)
+        }
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+async def test_export_import_round_trip(monkeypatch, make_database, fmt):
+    source, source_sessions = make_database("source")
+    with source.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "username": "ana", "email": "ana@example.com"}])
+        conn.execute(insert(Task.__table__), [
+            {"id": 1, "title": "Empty description", "description": "", "priority": 1, "status": "Pending", "progress": 0},
+            {"id": 2, "title": 'Quoted "title"', "description": "two\nlines, with a comma", "priority": 3,
+             "status": "Completed", "progress": 100, "is_deleted": True},
+        ])
+        conn.execute(insert(Comment.__table__), [
+            {"id": 1, "task_id": 1, "author_id": 1, "content": "by ana"},
+            {"id": 2, "task_id": 1, "author_id": None, "content": ""},
+        ])
+
+    target, target_sessions = make_database("target")
+    for kind in ("users", "tasks", "comments"):
+        content = await export(monkeypatch, source_sessions, kind, fmt)
+        assert await load(target_sessions, kind, fmt, content) == len(dump(source)[kind])
+
+    assert dump(target) == dump(source)
+
+
+async def test_imported_equal_timestamps_page_through(make_database):
+    engine, sessions = make_database("paging")
+    # A row written by the server, then imported ones with the same timestamp
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (id, title, description, priority, status, progress, is_deleted, created_at, updated_at)"
+            " VALUES (99, 't', '', 1, 'Pending', 0, 0, '2026-01-01 12:00:00', '2026-01-01 12:00:00')"
+        )
+    content = "".join(
+        f'{{"id": {task_id}, "title": "t", "description": "", "priority": 1, "status": "Pending", "progress": 0,'
+        f' "updated_at": "2026-01-01T19:00:00+07:00"}}\n'
+        for task_id in (100, 101, 102)
+    )
+    assert await load(sessions, "tasks", "ndjson", content) == 3
+
+    for sort, expected in [("-updated_at", [102, 101, 100, 99]), ("updated_at", [99, 100, 101, 102])]:
+        ids, cursor = [], None
+        with engine.connect() as conn:
+            while len(ids) <= len(expected):
+                value, row_id = decode_cursor(cursor, sort) if cursor else (None, None)
+                query = apply_keyset(
+                    select(Task.id, Task.updated_at), "sqlite", Task.updated_at, Task.id, sort.startswith("-"),
+                    value, row_id,
+                ).limit(2)
+                rows = conn.execute(query).all()
+                ids.append(rows[0].id)
+                if len(rows) < 2:
+                    break
+                cursor = encode_cursor(sort, rows[0].updated_at, rows[0].id)
+        assert ids == expected
+
+    # Stored as UTC, like the server's own timestamps
+    with engine.connect() as conn:
+        assert set(conn.execute(select(Task.updated_at)).scalars()) == {STAMP}
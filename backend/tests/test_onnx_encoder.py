@@ -0,0 +1,88 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import ai
+
+# Token embeddings by id; id 0 is padding and must not count towards the mean
+TOKEN_EMBEDDINGS = np.array([[100.0, 100.0], [1.0, 0.0], [3.0, 4.0], [0.0, 2.0]], dtype=np.float32)
+VOCABULARY = {"a": 1, "b": 2, "c": 3}
+
+
+class FakeEncoding:
+    def __init__(self, ids, length):
+        padding = length - len(ids)
+        self.ids = ids + [0] * padding
+        self.attention_mask = [1] * len(ids) + [0] * padding
+        self.type_ids = [0] * length
+
+
+class FakeTokenizer:
+    @classmethod
+    def from_file(cls, path):
+        return cls()
+
+    def enable_truncation(self, max_length):
+        self.max_length = max_length
+
+    def enable_padding(self):
+        pass
+
+    def encode_batch(self, texts):
+        ids = [[VOCABULARY[word] for word in text.split()][:self.max_length] for text in texts]
+        length = max(len(i) for i in ids)
+        return [FakeEncoding(i, length) for i in ids]
+
+
+class FakeSession:
+    def __init__(self, path, options, providers):
+        self.calls = []
+
+    def get_inputs(self):
+        # Like MiniLM exports without token_type_ids
+        return [types.SimpleNamespace(name="input_ids"), types.SimpleNamespace(name="attention_mask")]
+
+    def get_outputs(self):
+        return [types.SimpleNamespace(name="last_hidden_state", shape=["batch", "tokens", 2])]
+
+    def run(self, output_names, inputs):
+        self.calls.append(sorted(inputs))
+        return [TOKEN_EMBEDDINGS[inputs["input_ids"]]]
+
+
+@pytest.fixture
+def encoder(monkeypatch, tmp_path):
+    onnxruntime = types.ModuleType("onnxruntime")
+    onnxruntime.SessionOptions = types.SimpleNamespace
+    onnxruntime.InferenceSession = FakeSession
+    tokenizers = types.ModuleType("tokenizers")
+    tokenizers.Tokenizer = FakeTokenizer
+    monkeypatch.setitem(sys.modules, "onnxruntime", onnxruntime)
+    monkeypatch.setitem(sys.modules, "tokenizers", tokenizers)
+    return ai.OnnxEncoder(str(tmp_path))
+
+
+def test_mean_pools_over_the_attention_mask(encoder):
+    # "a b" -> mean([1, 0], [3, 4]) = [2, 2]; "c" is padded, so only [0, 2] counts
+    embeddings = encoder.encode(["a b", "c"])
+    np.testing.assert_allclose(embeddings, [[2.0, 2.0], [0.0, 2.0]])
+    assert embeddings.dtype == np.float32
+    assert encoder.session.calls == [["attention_mask", "input_ids"]]
+
+
+def test_normalizes_to_unit_length(encoder):
+    embeddings = encoder.encode(["a b", "c"], normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, [[2 ** -0.5, 2 ** -0.5], [0.0, 1.0]], rtol=1e-6)
+
+
+def test_batches_match_a_single_pass(encoder):
+    texts = ["a b", "c", "b c a"]
+    np.testing.assert_allclose(encoder.encode(texts, batch_size=1), encoder.encode(texts), rtol=1e-6)
+    # "b c a" -> mean([3, 4], [0, 2], [1, 0]) = [4/3, 2]
+    np.testing.assert_allclose(encoder.encode(texts)[2], [4 / 3, 2.0], rtol=1e-6)
+
+
+def test_empty_input_keeps_the_embedding_width(encoder):
+    assert encoder.encode([]).shape == (0, 2)
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert, select
+
+from models import Base, Task
+from pagination import apply_keyset, datetime_bound, datetime_key, decode_cursor, encode_cursor, parse_sort
+
+STAMP = datetime(2026, 1, 1, 12, 0, 0)
+COLUMNS = {"id": Task.id, "priority": Task.priority, "updated_at": Task.updated_at}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pages.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def add_tasks(engine, *rows):
+    """Insert (id, updated_at) rows; str timestamps are stored as given, like CURRENT_TIMESTAMP writes them."""
+    with engine.begin() as conn:
+        for task_id, updated_at in rows:
+            conn.exec_driver_sql(
+                "INSERT INTO tasks (id, title, description, priority, status, progress, is_deleted, created_at, updated_at)"
+                " VALUES (?, 't', '', 1, 'Pending', 0, 0, ?, ?)",
+                (task_id, updated_at, updated_at),
+            )
+
+
+def page_through(engine, sort, limit=1):
+    field, descending = parse_sort(sort, COLUMNS)
+    column = COLUMNS[field]
+    ids, cursor = [], None
+    with engine.connect() as conn:
+        for _ in range(20):
+            value, row_id = decode_cursor(cursor, sort) if cursor else (None, None)
+            query = apply_keyset(
+                select(Task.id, column.label("key")), "sqlite", column, Task.id, descending, value, row_id
+            ).limit(limit + 1)
+            rows = conn.execute(query).all()
+            ids.extend(row.id for row in rows[:limit])
+            if len(rows) <= limit:
+                return ids
+            last = rows[limit - 1]
+            cursor = encode_cursor(sort, last.key, last.id)
+    raise AssertionError(f"cursor did not advance: {ids}")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("-updated_at", STAMP, 7)
+    assert decode_cursor(cursor, "-updated_at") == (STAMP.isoformat(), 7)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, "updated_at")
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor", "updated_at")
+
+
+@pytest.mark.parametrize("sort, expected", [("updated_at", [1, 2, 3, 4]), ("-updated_at", [4, 3, 2, 1])])
+def test_keyset_pages_through_equal_timestamps(engine, sort, expected):
+    # Server writes store whole seconds as text, SQLAlchemy binds add microseconds
+    add_tasks(engine, (1, "2026-01-01 12:00:00"), (3, "2026-01-01 12:00:00"))
+    with engine.begin() as conn:
+        conn.execute(insert(Task.__table__), [
+            {"id": 2, "title": "t", "description": "", "updated_at": STAMP},
+            {"id": 4, "title": "t", "description": "", "updated_at": STAMP},
+        ])
+    assert page_through(engine, sort) == expected
+
+
+def test_keyset_orders_by_time_then_id(engine):
+    add_tasks(engine, (1, "2026-01-01 12:00:01"), (2, "2026-01-01 12:00:00"), (3, "2026-01-01 12:00:00.500000"))
+    assert page_through(engine, "updated_at", limit=2) == [2, 3, 1]
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("priority", [2, 4, 1, 3, 5]),
+    ("-priority", [5, 3, 1, 4, 2]),
+    ("id", [1, 2, 3, 4, 5]),
+    ("-id", [5, 4, 3, 2, 1]),
+])
+def test_keyset_pages_through_other_sort_keys(engine, sort, expected):
+    add_tasks(engine, *((task_id, "2026-01-01 12:00:00") for task_id in range(1, 6)))
+    with engine.begin() as conn:
+        for task_id, priority in [(1, 2), (2, 1), (3, 2), (4, 1), (5, 3)]:
+            conn.execute(Task.__table__.update().where(Task.id == task_id).values(priority=priority))
+    assert page_through(engine, sort, limit=2) == expected
+
+
+def test_parse_sort_rejects_unknown_fields():
+    assert parse_sort("-updated_at", COLUMNS) == ("updated_at", True)
+    with pytest.raises(HTTPException) as error:
+        parse_sort("-title", COLUMNS)
+    assert error.value.status_code == 400
+
+
+def test_datetime_bound_converts_offsets_to_utc():
+    bound = datetime(2026, 10, 19, 3, 0, tzinfo=timezone(timedelta(hours=7)))
+    assert datetime_bound("postgresql", bound) == datetime(2026, 10, 18, 20, 0)
+
+
+@pytest.mark.parametrize("hours, included", [(7, True), (5, False)])
+def test_offset_aware_bound_on_sqlite(engine, hours, included):
+    add_tasks(engine, (1, "2026-10-18 21:07:00"))
+    # 03:00 at +07:00 is 20:00 UTC, before the update; at +05:00 it is 22:00 UTC, after it
+    bound = datetime(2026, 10, 19, 3, 0, tzinfo=timezone(timedelta(hours=hours)))
+    query = select(Task.id).where(datetime_key("sqlite", Task.updated_at) >= datetime_bound("sqlite", bound))
+    with engine.connect() as conn:
+        assert conn.execute(query).scalars().all() == ([1] if included else [])
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import create_engine
+from models import Base
+from migrations import full_scans, query_plans, run_migrations
+
+# Indexes a hot query may be served by, as shown in EXPLAIN QUERY PLAN
+EXPECTED_INDEXES = {
+    # Without table statistics SQLite picks either index for this one
+    "tasks by status and priority": ("ix_tasks_live_status_priority", "ix_tasks_deleted_status"),
+    "tasks by update time, after a cursor": ("ix_tasks_deleted_updated_key",),
+    "task counts by status": ("ix_tasks_deleted_status",),
+    "comments of a task": ("ix_comments_task_id_id",),
+    "attachments of a task": ("ix_attachments_task_id_deleted",),
+    "attachment by file name": ("ix_attachments_file_name_deleted",),
+}
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'plans.db'}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+def test_hot_queries_avoid_full_scans(engine):
+    assert full_scans(query_plans(engine)) == {}
+
+@pytest.mark.parametrize("name, indexes", EXPECTED_INDEXES.items())
+def test_hot_query_uses_index(engine, name, indexes):
+    plan = " ".join(query_plans(engine)[name])
+    assert any(index in plan for index in indexes), plan
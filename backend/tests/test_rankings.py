@@ -0,0 +1,64 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from recommendations import Ranking
+
+# Ranking copies tasks with TaskResponse.from_orm, once per task here
+pytestmark = pytest.mark.filterwarnings("ignore:The `from_orm` method is deprecated")
+
+STATUSES = ["Pending", "In Progress", "Completed"]
+
+
+def make_task(task_id, rng):
+    return SimpleNamespace(
+        id=task_id, title=f"t{task_id}", description="", priority=rng.randint(1, 3), status=rng.choice(STATUSES),
+        progress=0, created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 1),
+    )
+
+
+def expected_page(tasks, scores, limit, offset, status, priority, exclude_completed):
+    ranked = sorted(tasks.values(), key=lambda task: (-scores[task.id], task.id))
+    matching = [
+        task.id for task in ranked
+        if (not status or task.status in status)
+        and (not priority or task.priority in priority)
+        and not (exclude_completed and task.status == "Completed")
+    ]
+    return matching[offset:offset + limit]
+
+
+@pytest.fixture
+def ranking():
+    rng = random.Random(7)
+    tasks = {task_id: make_task(task_id, rng) for task_id in range(1, 201)}
+    # Few distinct scores, so ties are broken by id
+    scores = {task_id: rng.randint(0, 20) / 10 for task_id in tasks}
+    ranking = Ranking("urgent")
+    ranking.load(list(tasks.values()), [scores[task_id] for task_id in tasks])
+
+    for task_id in rng.sample(sorted(tasks), 60):
+        tasks[task_id] = make_task(task_id, rng)
+        scores[task_id] = rng.randint(0, 20) / 10
+        ranking.upsert(tasks[task_id], scores[task_id])
+    for task_id in rng.sample(sorted(tasks), 30):
+        del tasks[task_id]
+        ranking.remove(task_id)
+    return ranking, tasks, scores
+
+
+@pytest.mark.parametrize("status, priority, exclude_completed", [
+    (None, None, False),
+    (["Pending"], None, False),
+    (None, [3], False),
+    (["Pending", "Completed"], [1, 2], False),
+    (None, None, True),
+    (["Completed"], None, True),
+])
+@pytest.mark.parametrize("limit, offset", [(10, 0), (7, 15), (50, 160)])
+def test_filtered_pages_match_a_full_scan(ranking, status, priority, exclude_completed, limit, offset):
+    ranking, tasks, scores = ranking
+    page = ranking.page(limit, offset, status=status, priority=priority, exclude_completed=exclude_completed)
+    assert [task.id for task in page] == expected_page(tasks, scores, limit, offset, status, priority, exclude_completed)
@@ -0,0 +1,26 @@
+import pytest
+
+from response_cache import CacheBackend, MemoryBackend, ResponseCache
+
+
+def test_incomplete_backend_fails_at_construction():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_memory_backend_counts_responses_not_counters():
+    backend = MemoryBackend(max_entries=2)
+    backend.incr("gen:tasks")
+    assert len(backend) == 0
+
+    for key in ("resp:a", "resp:b", "resp:c"):
+        backend.set(key, b"{}", ttl=30)
+    # Least recently used response evicted, the counter kept
+    assert len(backend) == 2
+    assert backend.get("resp:a") is None
+    assert backend.get_counters(["gen:tasks", "gen:other"]) == [1, 0]
+    assert ResponseCache(backend, ttl=30).stats()["entries"] == 2
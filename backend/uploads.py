@@ -0,0 +1,304 @@
+import os
+import uuid
+import hashlib
+import tempfile
+from typing import NamedTuple
+import magic
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Blob
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+UPLOAD_DIR = "uploads"
+# Partial uploads; inside UPLOAD_DIR so the final rename stays on one filesystem
+INCOMING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+
+MAX_UPLOAD_SIZE_MB = float(os.getenv("TASKAI_MAX_UPLOAD_MB", "5"))
+MAX_UPLOAD_SIZE = int(MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+# Bytes buffered before each disk write; a multiple of the filesystem block size
+UPLOAD_CHUNK_SIZE = int(os.getenv("TASKAI_UPLOAD_CHUNK_KB", "1024")) * 1024
+# Allowance for multipart boundaries and part headers when checking Content-Length
+MULTIPART_OVERHEAD = 16 * 1024
+MIME_SNIFF_SIZE = 2048
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".docx", ".xlsx", ".zip", ".txt", ".csv"}
+
+ALLOWED_MIME_TYPES = {
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/zip",
+    "text/plain",
+    "text/csv",
+    "application/vnd.ms-excel"
+}
+
+# Request body schema for the docs, since the body is parsed by hand
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+class StoredUpload(NamedTuple):
+    original_name: str
+    path: str
+    size: int
+    mime: str
+    sha256: str
+
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"File size exceeds the limit of {MAX_UPLOAD_SIZE_MB:g} MB."
+    )
+
+def check_content_length(request: Request):
+    """Reject a body that announces itself as too large before any of it is read."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD:
+        raise _too_large()
+
+def _file_extension(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"File type '{extension}' is not allowed.")
+    return extension
+
+def _check_mime(head):
+    mime = magic.from_buffer(head, mime=True)
+    if mime not in ALLOWED_MIME_TYPES:
+        raise HTTPException(status_code=400, detail=f"MIME type '{mime}' is not allowed.")
+    return mime
+
+def _write_chunk(target, checksum, data):
+    checksum.update(data)
+    target.write(data)
+
+class _FilePart:
+    """Collects the parts of a multipart body through python-multipart callbacks."""
+
+    def __init__(self, field):
+        self.field = field
+        self.filename = None
+        self.size = 0
+        self.pending = bytearray()
+        self.done = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_field_data(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        filename = options.get(b"filename")
+        self._in_file = not self.done and name == self.field and filename is not None
+        if self._in_file:
+            self.filename = filename.decode("utf-8", "replace")
+            _file_extension(self.filename)
+
+    def _part_data(self, data, start, end):
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > MAX_UPLOAD_SIZE:
+            raise _too_large()
+        self.pending += data[start:end]
+
+    def _part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.done = True
+
+async def receive_upload(request: Request, field="file"):
+    """Stream one multipart file field to disk without holding the body in memory.
+
+    The body is parsed as it arrives: the MIME type is sniffed from the first
+    bytes, data is written to a temporary file in UPLOAD_CHUNK_SIZE blocks while
+    its SHA-256 is computed, and the size limit is enforced on the running count.
+    Returns the temporary file; the caller moves it into place with `store_blob`.
+    """
+    _, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+    part = _FilePart(field)
+    parser = MultipartParser(boundary, part.callbacks())
+    checksum = hashlib.sha256()
+    mime = None
+    written = 0
+
+    target = await run_in_threadpool(tempfile.NamedTemporaryFile, dir=INCOMING_DIR, suffix=".part", delete=False)
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if mime is None and (len(part.pending) >= MIME_SNIFF_SIZE or (part.done and part.pending)):
+                mime = await run_in_threadpool(_check_mime, bytes(part.pending[:MIME_SNIFF_SIZE]))
+            if mime is not None and (len(part.pending) >= UPLOAD_CHUNK_SIZE or part.done):
+                data, part.pending = bytes(part.pending), bytearray()
+                await run_in_threadpool(_write_chunk, target, checksum, data)
+                written += len(data)
+        parser.finalize()
+
+        if part.filename is None:
+            raise HTTPException(status_code=400, detail=f"Missing file field '{field}'")
+        if not part.done:
+            # The body ended before the closing boundary of the file part
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+        if mime is None:
+            # Empty file: nothing was written, sniff the empty buffer for a consistent answer
+            mime = await run_in_threadpool(_check_mime, bytes(part.pending))
+        if written != part.size:
+            # The checksum and size must describe exactly the bytes on disk
+            raise RuntimeError(f"Wrote {written} of {part.size} bytes of upload '{part.filename}'")
+
+        await run_in_threadpool(target.close)
+        return StoredUpload(part.filename, target.name, part.size, mime, checksum.hexdigest())
+    except BaseException:
+        await run_in_threadpool(_discard, target)
+        raise
+
+def _discard(target):
+    target.close()
+    if os.path.exists(target.name):
+        os.remove(target.name)
+
+def blob_name(sha256):
+    """Sharded storage name of a blob, e.g. "ab/cd/abcd12..."; also its URL path under /uploads/."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+def blob_path(sha256):
+    return os.path.join(UPLOAD_DIR, *blob_name(sha256).split("/"))
+
+def store_blob(upload: StoredUpload):
+    """Link a received upload to its content address; returns False if that content was already stored.
+
+    The temporary file is kept until `finish_blob`, which runs after the commit.
+    """
+    file_location = blob_path(upload.sha256)
+    if os.path.exists(file_location):
+        return False
+    os.makedirs(os.path.dirname(file_location), exist_ok=True)
+    try:
+        os.link(upload.path, file_location)
+    except FileExistsError:
+        return False
+    return True
+
+def finish_blob(upload: StoredUpload):
+    """Once the blob reference is committed, move the upload to its content address, replacing any file there.
+
+    The content is identical, so replacing is harmless. It also puts back a
+    file that a concurrent delete of the same content removed before this
+    upload's reference was committed (see `remove_blob_file`).
+    """
+    file_location = blob_path(upload.sha256)
+    try:
+        if os.path.samefile(upload.path, file_location):
+            # Still the link made by store_blob; rename() between two links to one file does nothing
+            os.remove(upload.path)
+            return
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(file_location), exist_ok=True)
+    os.replace(upload.path, file_location)
+
+def discard_upload(upload: StoredUpload):
+    if os.path.exists(upload.path):
+        os.remove(upload.path)
+
+def upload_path(file_name):
+    """Path of a stored file under UPLOAD_DIR, or None if the name points outside it or at a partial upload."""
+    parts = file_name.split("/")
+    if any(part in ("", ".", "..") or part.startswith(".") for part in parts):
+        return None
+    upload_dir = os.path.abspath(UPLOAD_DIR)
+    file_location = os.path.abspath(os.path.join(upload_dir, *parts))
+    if os.path.commonpath([upload_dir, file_location]) != upload_dir:
+        return None
+    return file_location
+
+async def acquire_blob(db: AsyncSession, upload: StoredUpload):
+    """Count one more reference to the upload's blob, recording the blob if it is new. The caller commits."""
+    add_reference = update(Blob).where(Blob.sha256 == upload.sha256).values(ref_count=Blob.ref_count + 1)
+    if (await db.execute(add_reference)).rowcount:
+        return
+    try:
+        async with db.begin_nested():
+            db.add(Blob(sha256=upload.sha256, size=upload.size, mime=upload.mime, ref_count=1))
+    except IntegrityError:
+        # Recorded by a concurrent upload of the same content
+        await db.execute(add_reference)
+
+async def release_blob(db: AsyncSession, sha256):
+    """Drop one reference to a blob; returns True if it was the last one and `remove_blob_file` should run after commit."""
+    await db.execute(update(Blob).where(Blob.sha256 == sha256).values(ref_count=Blob.ref_count - 1))
+    result = await db.execute(delete(Blob).where(Blob.sha256 == sha256, Blob.ref_count <= 0))
+    return result.rowcount > 0
+
+async def remove_blob_file(db: AsyncSession, sha256):
+    """Remove the file of a blob whose last reference was committed away; returns True if it was removed.
+
+    An upload of the same content may record the blob again in the meantime.
+    The file is moved aside first, and only dropped if the blob is still
+    unrecorded afterwards; otherwise it is put back. An upload that records
+    the blob later moves its own copy into place after its commit, so either
+    way a recorded blob keeps its file.
+    """
+    file_location = blob_path(sha256)
+    # Dot-prefixed, so upload_path never serves it
+    aside = os.path.join(os.path.dirname(file_location), f".{sha256}.{uuid.uuid4().hex}.deleted")
+    try:
+        await run_in_threadpool(os.replace, file_location, aside)
+    except FileNotFoundError:
+        return False
+    if await db.scalar(select(Blob.sha256).where(Blob.sha256 == sha256)):
+        await run_in_threadpool(os.replace, aside, file_location)
+        return False
+    await run_in_threadpool(os.remove, aside)
+    return True
@@ -0,0 +1,280 @@
+import os
+import logging
+import threading
+import time
+import numpy as np
+from sqlalchemy import func
+from ai import encode_texts, model_key
+from changes import entries_after, head_statement
+from database import SessionLocal
+from embedding_cache import get_task_embeddings
+from models import Change, Task
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, every worker saves
+    fcntl = None
+
+logger = logging.getLogger("taskai")
+
+# Where the index is kept between restarts
+VECTOR_INDEX_PATH = os.getenv("TASKAI_VECTOR_INDEX_PATH", "vector_index.npz")
+# Seconds between saves while writes keep coming in; the index is also saved on shutdown
+VECTOR_INDEX_SAVE_INTERVAL = float(os.getenv("TASKAI_VECTOR_INDEX_SAVE_INTERVAL", "60"))
+# Cosine similarity above which a new task is reported as a likely duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("TASKAI_DUPLICATE_THRESHOLD", "0.9"))
+
+# Tasks are compared by their title embedding, shared with the "text" scoring dimension
+INDEX_DIMENSION = "text"
+
+_CHUNK = 500
+
+class VectorIndex:
+    """Normalized task embeddings in one in-memory matrix, searched by brute-force cosine similarity.
+
+    The index remembers its position in the change log (changes.py) and
+    catches up from there before every use. Writes made through other
+    workers, or while the process was down, are therefore applied too. The
+    saved file carries the position it reflects, so any worker can resume
+    from it. Only the worker holding the lock file writes it.
+    """
+
+    def __init__(self, path, dimension=INDEX_DIMENSION):
+        self.path = path
+        self.dimension = dimension
+        self.loaded = False
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = None
+        self._size = 0
+        self._positions = {}  # task_id -> row
+        self._position = None  # change log position reflected in the index
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.RLock()
+        self._file_lock = None
+
+    @property
+    def model(self):
+        return model_key(self.dimension)
+
+    def __len__(self):
+        return self._size
+
+    def ensure_current(self):
+        """Load or build the index on first use, then apply the changes logged since its position."""
+        with self._lock:
+            db = SessionLocal()
+            try:
+                if not self.loaded:
+                    self._load(db)
+                else:
+                    self._catch_up(db)
+            except Exception as e:
+                # Rebuilt on the next use rather than answer from an index that missed writes
+                logger.error(f"Failed to update vector index: {e}")
+                self.invalidate()
+                raise
+            finally:
+                db.close()
+        if self._dirty and time.monotonic() - self._saved_at > VECTOR_INDEX_SAVE_INTERVAL:
+            self.save()
+
+    def sync(self):
+        """Apply pending changes after a write; a no-op until the index is first used."""
+        if not self.loaded:
+            return
+        try:
+            self.ensure_current()
+        except Exception:
+            pass  # already logged; the next use rebuilds the index
+
+    def _load(self, db):
+        if self._load_file() and self._catch_up(db):
+            logger.info(f"Loaded vector index with {self._size} tasks")
+        else:
+            self._reset()
+            # Taken before reading the tasks, so writes committed meanwhile are applied on the next use
+            row = db.execute(head_statement(db)).first()
+            self._position = (row.txid, row.id) if row else (0, 0)
+            self._apply(db, db.query(Task).filter(Task.is_deleted == False).all())
+            self._dirty = True
+            logger.info(f"Built vector index for {self._size} tasks")
+        self.loaded = True
+        self._saved_at = 0.0  # save the loaded state right away
+
+    def _catch_up(self, db):
+        """Apply the tasks changed after the position; False when the log no longer reaches back that far."""
+        oldest = db.query(func.min(Change.id)).scalar()
+        if oldest is not None and self._position[1] < oldest - 1:
+            return False
+        while True:
+            entries = db.execute(
+                entries_after(db, self._position, Change.entity, Change.entity_id).limit(_CHUNK)
+            ).all()
+            if not entries:
+                return True
+            task_ids = list({entry.entity_id for entry in entries if entry.entity == "task"})
+            tasks = db.query(Task).filter(Task.id.in_(task_ids)).all() if task_ids else []
+            for task_id in set(task_ids) - {task.id for task in tasks}:
+                self._remove(task_id)
+            self._apply(db, tasks)
+            self._position = (entries[-1].txid, entries[-1].id)
+            self._dirty = True
+
+    def invalidate(self):
+        """Forget the in-memory index; the next use loads the saved one and catches up, or rebuilds."""
+        with self._lock:
+            self._reset()
+            self.loaded = False
+
+    def save(self):
+        """Write the index to disk atomically if it changed since the last save."""
+        with self._lock:
+            if not self._dirty or self._matrix is None or not self._owns_file():
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as target:
+                np.savez(
+                    target,
+                    model=np.array(self.model),
+                    position=np.array(self._position, dtype=np.int64),
+                    ids=self._ids[:self._size],
+                    matrix=self._matrix[:self._size],
+                )
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def _owns_file(self):
+        """Whether this worker writes the index file; the first to take the lock file keeps it for its lifetime."""
+        if fcntl is None or self._file_lock is not None:
+            return True
+        handle = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._file_lock = handle
+        return True
+
+    def vector(self, task_id):
+        with self._lock:
+            row = self._positions.get(task_id)
+            return None if row is None else self._matrix[row].copy()
+
+    def search(self, vector, limit=10, exclude=(), min_score=None):
+        """Return up to limit (task_id, similarity) pairs, most similar first."""
+        with self._lock:
+            if not self._size:
+                return []
+            scores = self._matrix[:self._size] @ vector
+            ids = self._ids[:self._size]
+            k = min(limit + len(exclude), self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results = [(int(ids[i]), float(scores[i])) for i in top if int(ids[i]) not in exclude]
+        if min_score is not None:
+            results = [result for result in results if result[1] >= min_score]
+        return results[:limit]
+
+    def _load_file(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                if str(data["model"]) != self.model or "position" not in data:
+                    logger.info("Saved vector index is for another model or an older format, rebuilding")
+                    return False
+                ids = data["ids"]
+                matrix = data["matrix"]
+                position = tuple(int(value) for value in data["position"])
+        except Exception as e:
+            logger.warning(f"Could not read vector index {self.path}, rebuilding: {e}")
+            return False
+
+        self._ids = ids.astype(np.int64)
+        self._matrix = matrix.astype(np.float32)
+        self._size = len(ids)
+        self._positions = {int(task_id): row for row, task_id in enumerate(self._ids)}
+        self._position = position
+        return True
+
+    def _reset(self):
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = None
+        self._size = 0
+        self._positions = {}
+        self._position = None
+        self._dirty = False
+
+    def _apply(self, db, tasks):
+        live = [task for task in tasks if not task.is_deleted]
+        for task in tasks:
+            if task.is_deleted:
+                self._remove(task.id)
+        for start in range(0, len(live), _CHUNK):
+            chunk = live[start:start + _CHUNK]
+            for task, vector in zip(chunk, get_task_embeddings(db, chunk, self.dimension)):
+                self._upsert(task.id, vector)
+        if tasks:
+            self._dirty = True
+
+    def _upsert(self, task_id, vector):
+        row = self._positions.get(task_id)
+        if row is None:
+            if self._matrix is None:
+                self._matrix = np.empty((0, len(vector)), dtype=np.float32)
+            if self._size == len(self._ids):
+                # Grow geometrically so appends stay amortized O(1)
+                capacity = max(64, 2 * self._size)
+                self._ids = np.resize(self._ids, capacity)
+                matrix = np.empty((capacity, self._matrix.shape[1]), dtype=np.float32)
+                matrix[:self._size] = self._matrix[:self._size]
+                self._matrix = matrix
+            row = self._size
+            self._size += 1
+            self._ids[row] = task_id
+            self._positions[task_id] = row
+        self._matrix[row] = vector
+
+    def _remove(self, task_id):
+        row = self._positions.pop(task_id, None)
+        if row is None:
+            return
+        # Move the last row into the gap to keep the rows contiguous
+        last = self._size - 1
+        if row != last:
+            self._ids[row] = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._positions[int(self._ids[row])] = row
+        self._size = last
+
+vector_index = VectorIndex(VECTOR_INDEX_PATH)
+
+def similar_tasks(task_id, limit=10):
+    """Tasks most similar to a task; runs on the inference pool."""
+    vector_index.ensure_current()
+    vector = vector_index.vector(task_id)
+    if vector is None:
+        db = SessionLocal()
+        try:
+            task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
+            if task is None:
+                return None
+            vector = get_task_embeddings(db, [task], INDEX_DIMENSION)[0]
+        finally:
+            db.close()
+    return vector_index.search(vector, limit, exclude={task_id})
+
+def semantic_search(q, limit=10):
+    """Tasks whose titles are closest in meaning to free text; runs on the inference pool."""
+    vector_index.ensure_current()
+    return vector_index.search(encode_texts(INDEX_DIMENSION, [q])[0], limit)
+
+def find_duplicates(title, exclude_id=None, limit=5):
+    """Existing tasks whose titles are likely duplicates of title; runs on the inference pool."""
+    vector_index.ensure_current()
+    exclude = {exclude_id} if exclude_id is not None else set()
+    vector = encode_texts(INDEX_DIMENSION, [title])[0]
+    return vector_index.search(vector, limit, exclude=exclude, min_score=DUPLICATE_THRESHOLD)
@@ -1,5 +1,5 @@
 import { API_URL } from "$lib/config";
-import type { Task, NewTask } from "$lib/types/task/task";
+import type { Task, NewTask, TaskStats } from "$lib/types/task/task";
 
 // Get all tasks
 export async function fetchTasks(): Promise<Task[]> {
@@ -8,6 +8,33 @@ export async function fetchTasks(): Promise<Task[]> {
     return res.json();
 }
 
+export type TaskQuery = Record<string, string | number | (string | number)[] | undefined>;
+
+// Get one page of tasks; pass the returned cursor back to fetch the next page
+export async function fetchTasksPage(query: TaskQuery = {}): Promise<{ items: Task[]; nextCursor: string | null }> {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+        if (value === undefined) continue;
+        for (const item of Array.isArray(value) ? value : [value]) {
+            params.append(key, String(item));
+        }
+    }
+    const res = await fetch(`${API_URL}/tasks/?${params}`);
+    if (!res.ok) throw new Error("Failed to fetch tasks");
+    return { items: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
+}
+
+// Get aggregated task statistics
+export async function fetchTaskStats(query: TaskQuery = {}): Promise<TaskStats> {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+        if (value !== undefined) params.append(key, String(value));
+    }
+    const res = await fetch(`${API_URL}/tasks/stats?${params}`);
+    if (!res.ok) throw new Error("Failed to fetch task statistics");
+    return res.json();
+}
+
 // Get single task
 export async function fetchTaskById(id: string): Promise<Task> {
     const res = await fetch(`${API_URL}/tasks/${id}`);
@@ -48,8 +75,8 @@ export async function deleteTask(id: number): Promise<{ success: boolean }> {
 }
 
 // Get AI Recommendations
-export async function getAIRecommendations(mode: string = "urgent"): Promise<Task[]> {
-    const res = await fetch(`${API_URL}/tasks/recommendations/?mode=${mode}`);
+export async function getAIRecommendations(mode: string = "urgent", limit: number = 10): Promise<Task[]> {
+    const res = await fetch(`${API_URL}/tasks/recommendations/?mode=${mode}&limit=${limit}`);
     if (!res.ok) throw new Error("Failed to fetch recommendations");
     return res.json();
 }
@@ -2,6 +2,7 @@ export type Attachment = {
 	id: number;
 	original_name: string;
 	filename: string;
+	mime: string | null;
 	url: string;
 	task_id: number;
 	created_at: string;
@@ -13,6 +14,7 @@ export type RawAttachment = {
 	original_name: string;
 	file_name: string;
 	file_url: string;
+	mime: string | null;
 	uploaded_at: string;
   };
   
\ No newline at end of file
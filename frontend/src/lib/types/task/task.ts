@@ -19,4 +19,14 @@ export type NewTask = {
 	status: string;
 	progress: number;
   attachments: Attachment[];
-};
\ No newline at end of file
+};
+
+export type TaskStats = {
+	total: number;
+	completed: number;
+	fully_progressed: number;
+	average_progress: number;
+	by_status: Record<string, number>;
+	by_priority: { priority: number; count: number; average_progress: number }[];
+	daily: { date: string; created: number; completed: number; average_progress: number }[];
+};